@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from config import config
+from app.utils.task_queue import RaceProcessingQueue
 
 # Initialize Flask extensions
 db = SQLAlchemy()
@@ -10,6 +11,7 @@ migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = 'auth.login'
 login_manager.login_message_category = 'info'
+race_queue = RaceProcessingQueue()
 
 
 def create_app(config_name='default'):
@@ -22,6 +24,7 @@ def create_app(config_name='default'):
     db.init_app(app)
     migrate.init_app(app, db)
     login_manager.init_app(app)
+    race_queue.init_app(app, config_name)
     
     # Register blueprints
     from app.routes.main import main as main_blueprint
@@ -4,4 +4,8 @@ from app.models.race import Race
 from app.models.race_mark import RaceMark
 from app.models.race_segment import RaceSegment
 from app.models.maneuver import Maneuver
-from app.models.track_point import TrackPoint
\ No newline at end of file
+from app.models.track_point import TrackPoint
+from app.models.race_track import RaceTrack
+from app.models.user_stats import UserStats
+from app.models.wind_sample import WindSample
+from app.models.maneuver_summary import ManeuverSummary
\ No newline at end of file
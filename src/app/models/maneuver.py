@@ -32,6 +32,7 @@ class Maneuver(db.Model):
     vmg_before = db.Column(db.Float)     # VMG before maneuver
     vmg_after = db.Column(db.Float)      # VMG after maneuver
     efficiency = db.Column(db.Float)     # Efficiency rating (0-100%)
+    wind_speed = db.Column(db.Float)     # True wind speed in knots, if known
     
     # Track point references
     start_point_id = db.Column(db.Integer, db.ForeignKey('track_points.point_id'))
@@ -45,6 +46,12 @@ class Maneuver(db.Model):
     center_point = db.relationship('TrackPoint', foreign_keys=[center_point_id], backref='maneuver_centers')
     end_point = db.relationship('TrackPoint', foreign_keys=[end_point_id], backref='maneuver_ends')
     
+    __table_args__ = (
+        # Finds a race's maneuvers of one type with their efficiency from the
+        # index alone; cross-race rankings still sort the user's matches
+        db.Index('ix_maneuvers_race_id_type_efficiency', 'race_id', 'maneuver_type', 'efficiency'),
+    )
+    
     def __init__(self, **kwargs):
         super(Maneuver, self).__init__(**kwargs)
     
@@ -80,28 +87,41 @@ class Maneuver(db.Model):
     @classmethod
     def get_maneuver_stats(cls, race_id):
         """Get aggregate statistics for maneuvers by type"""
+        return cls.get_maneuver_stats_for_races([race_id]).get(race_id, {})
+    
+    @classmethod
+    def get_maneuver_stats_for_races(cls, race_ids):
+        """
+        Get aggregate maneuver statistics by type for many races in one query
+        
+        Args:
+            race_ids: IDs of the races
+        
+        Returns:
+            dict: Stats by maneuver type value, by race ID; races with no
+                  maneuvers are left out
+        """
         from sqlalchemy import func
         
+        rows = db.session.query(
+            cls.race_id,
+            cls.maneuver_type,
+            func.count(cls.maneuver_id).label('count'),
+            func.avg(cls.duration).label('avg_duration'),
+            func.avg(cls.speed_loss).label('avg_speed_loss'),
+            func.avg(cls.efficiency).label('avg_efficiency')
+        ).filter(
+            cls.race_id.in_(list(race_ids))
+        ).group_by(cls.race_id, cls.maneuver_type).all()
+        
         stats = {}
-        for maneuver_type in ManeuverType:
-            # Get aggregate data for this maneuver type
-            result = db.session.query(
-                func.count(cls.maneuver_id).label('count'),
-                func.avg(cls.duration).label('avg_duration'),
-                func.avg(cls.speed_loss).label('avg_speed_loss'),
-                func.avg(cls.efficiency).label('avg_efficiency')
-            ).filter_by(
-                race_id=race_id,
-                maneuver_type=maneuver_type
-            ).first()
-            
-            if result and result.count:
-                stats[maneuver_type.value] = {
-                    'count': result.count,
-                    'avg_duration': result.avg_duration,
-                    'avg_speed_loss': result.avg_speed_loss,
-                    'avg_efficiency': result.avg_efficiency
-                }
+        for row in rows:
+            stats.setdefault(row.race_id, {})[row.maneuver_type.value] = {
+                'count': row.count,
+                'avg_duration': row.avg_duration,
+                'avg_speed_loss': row.avg_speed_loss,
+                'avg_efficiency': row.avg_efficiency
+            }
         
         return stats
     
@@ -123,7 +143,8 @@ class Maneuver(db.Model):
             'heading_change': self.heading_change,
             'vmg_before': self.vmg_before,
             'vmg_after': self.vmg_after,
-            'efficiency': self.efficiency
+            'efficiency': self.efficiency,
+            'wind_speed': self.wind_speed
         }
     
     def __repr__(self):
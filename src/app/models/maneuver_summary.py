@@ -0,0 +1,144 @@
+from datetime import datetime
+import numpy as np
+from app import db
+from app.models.maneuver import Maneuver, ManeuverType
+
+# True wind speed bands in knots: (name, lower bound, upper bound)
+WIND_BANDS = (
+    ('0-6', 0, 6),
+    ('6-10', 6, 10),
+    ('10-14', 10, 14),
+    ('14-18', 14, 18),
+    ('18+', 18, None)
+)
+UNKNOWN_WIND_BAND = 'unknown'
+
+# Histogram bin edges per metric; values outside fall in the end bins
+HISTOGRAM_BINS = {
+    'speed_loss': np.arange(0.0, 11.0, 1.0),   # Knots
+    'duration': np.arange(0.0, 32.0, 2.0),     # Seconds
+    'efficiency': np.arange(0.0, 110.0, 10.0)  # Percent
+}
+
+
+def wind_band_for(wind_speed):
+    """Get the name of the wind band a wind speed (knots, or None) falls in"""
+    if wind_speed is None:
+        return UNKNOWN_WIND_BAND
+    for name, lower, upper in WIND_BANDS:
+        if upper is None or wind_speed < upper:
+            return name
+    return UNKNOWN_WIND_BAND
+
+
+def histogram(values, edges):
+    """Count values per bin, folding anything out of range into the end bins"""
+    values = np.asarray(values, dtype=np.float64)
+    bins = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+    return np.bincount(bins, minlength=len(edges) - 1).tolist()
+
+
+class ManeuverSummary(db.Model):
+    """
+    Model for pre-aggregated maneuver metrics per race, type and wind band
+    
+    Rows hold sums and fixed-bin histograms, so season-wide averages and
+    distributions add up a few rows per race instead of scanning every
+    maneuver. Rebuilt whenever a race's maneuvers are.
+    """
+    __tablename__ = 'maneuver_summaries'
+    
+    summary_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    race_id = db.Column(db.Integer, db.ForeignKey('races.race_id'), nullable=False, index=True)
+    maneuver_type = db.Column(db.Enum(ManeuverType), nullable=False)
+    wind_band = db.Column(db.String(16), nullable=False)
+    maneuver_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    # Sums of the non-null values; the matching histogram total is the count
+    duration_sum = db.Column(db.Float, nullable=False, default=0)
+    speed_loss_sum = db.Column(db.Float, nullable=False, default=0)
+    efficiency_sum = db.Column(db.Float, nullable=False, default=0)
+    duration_histogram = db.Column(db.JSON, nullable=False)
+    speed_loss_histogram = db.Column(db.JSON, nullable=False)
+    efficiency_histogram = db.Column(db.JSON, nullable=False)
+    
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_maneuver_summaries_user_id_type_wind_band', 'user_id', 'maneuver_type', 'wind_band'),
+    )
+    
+    def __init__(self, **kwargs):
+        super(ManeuverSummary, self).__init__(**kwargs)
+    
+    @classmethod
+    def rebuild_race(cls, race_id, user_id):
+        """
+        Replace a race's summary rows from its stored maneuvers
+        
+        The caller commits.
+        
+        Returns:
+            int: Number of summary rows stored
+        """
+        cls.query.filter_by(race_id=race_id).delete()
+        
+        rows = db.session.query(
+            Maneuver.maneuver_type,
+            Maneuver.wind_speed,
+            Maneuver.duration,
+            Maneuver.speed_loss,
+            Maneuver.efficiency
+        ).filter_by(race_id=race_id).all()
+        if not rows or user_id is None:
+            return 0
+        
+        groups = {}
+        for row in rows:
+            groups.setdefault((row.maneuver_type, wind_band_for(row.wind_speed)), []).append(row)
+        
+        created_at = datetime.utcnow()
+        summaries = []
+        for (maneuver_type, wind_band), group in groups.items():
+            summary = {
+                'user_id': user_id,
+                'race_id': race_id,
+                'maneuver_type': maneuver_type,
+                'wind_band': wind_band,
+                'maneuver_count': len(group),
+                'created_at': created_at
+            }
+            for name, edges in HISTOGRAM_BINS.items():
+                values = [getattr(row, name) for row in group if getattr(row, name) is not None]
+                summary[f'{name}_sum'] = float(sum(values))
+                summary[f'{name}_histogram'] = histogram(values, edges)
+            summaries.append(summary)
+        
+        db.session.execute(cls.__table__.insert(), summaries)
+        return len(summaries)
+    
+    @classmethod
+    def get_for_user(cls, user_id):
+        """
+        Get all of a user's summary rows, building any that are missing
+        
+        Races whose maneuvers predate the summary table are summarized on
+        first use.
+        """
+        from app.models.race import Race
+        
+        missing = db.session.query(Race.race_id).filter(
+            Race.user_id == user_id,
+            db.session.query(Maneuver.maneuver_id).filter(Maneuver.race_id == Race.race_id).exists(),
+            ~db.session.query(cls.summary_id).filter(cls.race_id == Race.race_id).exists()
+        ).all()
+        if missing:
+            for race_id, in missing:
+                cls.rebuild_race(race_id, user_id)
+            db.session.commit()
+        
+        return cls.query.filter_by(user_id=user_id).all()
+    
+    def __repr__(self):
+        return f'<ManeuverSummary race {self.race_id} {self.maneuver_type.value} {self.wind_band}>'
@@ -1,6 +1,14 @@
 from datetime import datetime
 import os
+import numpy as np
 from app import db
+from app.models.track_point import TrackPoint
+from app.models.race_track import RaceTrack, epoch_ms_to_datetime
+from app.models.user_stats import UserStats
+from app.utils.race_cache import RaceCache, invalidate_race
+
+# Track summaries by (race_id, track_updated_at); a new track_updated_at means new points
+_track_summary_cache = RaceCache(max_size=256)
 
 class Race(db.Model):
     """Model for storing sailing race data"""
@@ -11,9 +19,11 @@ class Race(db.Model):
     race_name = db.Column(db.String(128), nullable=False)
     race_date = db.Column(db.DateTime, nullable=False, index=True)
     gpx_file_path = db.Column(db.String(256), nullable=False)
+    gpx_sha256 = db.Column(db.String(64))  # Digest of the GPX file, for spotting re-uploads
     wind_direction = db.Column(db.Integer)  # Direction in degrees
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    track_updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Bumped only when the points change
     
     # Processing status flags
     is_processed = db.Column(db.Boolean, default=False)
@@ -25,11 +35,26 @@ class Race(db.Model):
     max_speed = db.Column(db.Float)  # In knots
     avg_speed = db.Column(db.Float)  # In knots
     
+    # Crop window: a view onto part of the track; points outside are kept
+    crop_start = db.Column(db.DateTime)
+    crop_end = db.Column(db.DateTime)
+    
+    # Denormalized counts so listing races needs no per-race COUNT queries
+    track_point_count = db.Column(db.Integer, default=0)
+    mark_count = db.Column(db.Integer, default=0)
+    
     # Relationships
     marks = db.relationship('RaceMark', backref='race', lazy='dynamic', cascade='all, delete-orphan')
     segments = db.relationship('RaceSegment', backref='race', lazy='dynamic', cascade='all, delete-orphan')
     maneuvers = db.relationship('Maneuver', backref='race', lazy='dynamic', cascade='all, delete-orphan')
     track_points = db.relationship('TrackPoint', backref='race', lazy='dynamic', cascade='all, delete-orphan')
+    track = db.relationship('RaceTrack', backref='race', uselist=False, cascade='all, delete-orphan')
+    wind_samples = db.relationship('WindSample', backref='race', lazy='dynamic', cascade='all, delete-orphan')
+    maneuver_summaries = db.relationship('ManeuverSummary', backref='race', lazy='dynamic', cascade='all, delete-orphan')
+    
+    __table_args__ = (
+        db.Index('ix_races_user_id_gpx_sha256', 'user_id', 'gpx_sha256'),
+    )
     
     def __init__(self, **kwargs):
         super(Race, self).__init__(**kwargs)
@@ -50,52 +75,159 @@ class Race(db.Model):
             base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../uploads'))
         return os.path.join(base_dir, self.gpx_file_path)
     
+    def get_track_summary(self):
+        """
+        Get point count, bounds, time range and speed range for the track
+        
+        Computed with a single aggregate query and cached per race until
+        the race's points change (see invalidate_track_caches).
+        
+        Returns:
+            dict: Summary values, or None if the race has no points
+        """
+        if TrackPoint.uses_columnar_storage():
+            loader = self._summarize_track_view
+        else:
+            loader = self._summarize_track_points
+        
+        return _track_summary_cache.get(self.race_id, self.track_updated_at, loader)
+    
+    def _summarize_track_points(self):
+        """Summarize TrackPoint rows in one aggregate query"""
+        func = db.func
+        row = db.session.query(
+            func.count(TrackPoint.point_id).label('point_count'),
+            func.min(TrackPoint.latitude).label('min_lat'),
+            func.max(TrackPoint.latitude).label('max_lat'),
+            func.min(TrackPoint.longitude).label('min_lon'),
+            func.max(TrackPoint.longitude).label('max_lon'),
+            func.min(TrackPoint.timestamp).label('start_time'),
+            func.max(TrackPoint.timestamp).label('end_time'),
+            func.min(TrackPoint.speed).label('min_speed'),
+            func.max(TrackPoint.speed).label('max_speed')
+        ).filter(TrackPoint.race_id == self.race_id).one()
+        
+        if not row.point_count:
+            return None
+        return dict(row._mapping)
+    
+    def _summarize_track_view(self):
+        """Summarize a packed RaceTrack from its single fetch"""
+        view = RaceTrack.get_view(self.race_id)
+        if not len(view):
+            return None
+        
+        speed = view.speed[~np.isnan(view.speed)]
+        return {
+            'point_count': len(view),
+            'min_lat': float(view.latitude.min()),
+            'max_lat': float(view.latitude.max()),
+            'min_lon': float(view.longitude.min()),
+            'max_lon': float(view.longitude.max()),
+            'start_time': epoch_ms_to_datetime(view.timestamp.min()),
+            'end_time': epoch_ms_to_datetime(view.timestamp.max()),
+            'min_speed': float(speed.min()) if len(speed) else None,
+            'max_speed': float(speed.max()) if len(speed) else None
+        }
+    
+    def invalidate_track_caches(self):
+        """Mark the race's points as changed so cached derived data is rebuilt"""
+        from app.utils.track_tiles import clear_race_tiles
+        invalidate_race(self.race_id)
+        clear_race_tiles(self.race_id)
+        # Other processes see the new track_updated_at and miss their caches too
+        self.track_updated_at = datetime.utcnow()
+    
+    def set_crop(self, start_time, end_time):
+        """
+        Set or clear the race's crop window
+        
+        Cropping is non-destructive: the points stay, and views such as
+        track_window.get_window_stats read the window. Cached track data is
+        still valid, so nothing is invalidated. The caller commits.
+        
+        Args:
+            start_time: Naive UTC start of the window, or None
+            end_time: Naive UTC end of the window, or None
+        
+        Raises:
+            ValueError: If the start is not before the end
+        """
+        if start_time is not None and end_time is not None and start_time >= end_time:
+            raise ValueError("Crop start must be before crop end")
+        
+        self.crop_start = start_time
+        self.crop_end = end_time
+    
     def get_track_boundaries(self):
         """Get min/max lat/lon values for the track"""
-        if not self.track_points.count():
+        summary = self.get_track_summary()
+        if not summary:
             return None
         
-        min_lat = db.session.query(db.func.min(TrackPoint.latitude)).filter_by(race_id=self.race_id).scalar()
-        max_lat = db.session.query(db.func.max(TrackPoint.latitude)).filter_by(race_id=self.race_id).scalar()
-        min_lon = db.session.query(db.func.min(TrackPoint.longitude)).filter_by(race_id=self.race_id).scalar()
-        max_lon = db.session.query(db.func.max(TrackPoint.longitude)).filter_by(race_id=self.race_id).scalar()
-        
         return {
-            'min_lat': min_lat,
-            'max_lat': max_lat,
-            'min_lon': min_lon,
-            'max_lon': max_lon
+            'min_lat': summary['min_lat'],
+            'max_lat': summary['max_lat'],
+            'min_lon': summary['min_lon'],
+            'max_lon': summary['max_lon']
         }
     
     def get_time_range(self):
         """Get first and last timestamp of the track"""
-        if not self.track_points.count():
+        summary = self.get_track_summary()
+        if not summary:
             return None
         
-        first_point = self.track_points.order_by(TrackPoint.timestamp).first()
-        last_point = self.track_points.order_by(TrackPoint.timestamp.desc()).first()
-        
         return {
-            'start_time': first_point.timestamp,
-            'end_time': last_point.timestamp
+            'start_time': summary['start_time'],
+            'end_time': summary['end_time']
         }
     
     def get_speed_range(self):
         """Get min/max speed values"""
-        if not self.track_points.count():
+        summary = self.get_track_summary()
+        if not summary:
             return None
         
-        min_speed = db.session.query(db.func.min(TrackPoint.speed)).filter_by(race_id=self.race_id).scalar() or 0
-        max_speed = db.session.query(db.func.max(TrackPoint.speed)).filter_by(race_id=self.race_id).scalar() or 0
-        
         return {
-            'min_speed': min_speed,
-            'max_speed': max_speed
+            'min_speed': summary['min_speed'] or 0,
+            'max_speed': summary['max_speed'] or 0
         }
     
+    @classmethod
+    def get_races_by_content(cls, user_id, digests):
+        """
+        Find a user's races made from GPX files with the given digests
+        
+        Races whose processing failed are skipped, so uploading the same
+        file again makes a fresh race instead of linking to the failure.
+        
+        Args:
+            user_id: ID of the user
+            digests: SHA-256 hex digests of GPX files
+        
+        Returns:
+            dict: The earliest race per digest, for digests that have one
+        """
+        races = {}
+        for race in cls.query.filter(
+            cls.user_id == user_id,
+            cls.gpx_sha256.in_(list(digests)),
+            cls.processing_error.is_(None)
+        ).order_by(cls.race_id.desc()):
+            races[race.gpx_sha256] = race
+        return races
+    
     def delete_gpx_file(self):
-        """Delete GPX file from filesystem"""
+        """Delete GPX file from filesystem, unless another race shares it"""
         if self.gpx_file_path:
+            # Uploads are stored by content, so re-uploads share a file
+            shared = db.session.query(Race.race_id).filter(
+                Race.gpx_file_path == self.gpx_file_path,
+                Race.race_id != self.race_id
+            ).first()
+            if shared:
+                return False
             try:
                 full_path = self.get_gpx_full_path()
                 if os.path.exists(full_path):
@@ -110,7 +242,7 @@ class Race(db.Model):
         return f'<Race {self.race_name} {self.race_date}>'
     
     @classmethod
-    def create_from_form(cls, form, user_id, gpx_file_path):
+    def create_from_form(cls, form, user_id, gpx_file_path, gpx_sha256=None):
         """
         Create a new race instance from form data
         
@@ -118,6 +250,7 @@ class Race(db.Model):
             form: The validated form data
             user_id: ID of the user who owns this race
             gpx_file_path: Path to the saved GPX file
+            gpx_sha256: SHA-256 hex digest of the GPX file
             
         Returns:
             Race: The newly created Race instance
@@ -127,12 +260,35 @@ class Race(db.Model):
             race_name=form.race_name.data,
             race_date=form.race_date.data,
             gpx_file_path=gpx_file_path,
+            gpx_sha256=gpx_sha256,
             is_processed=False
         )
         db.session.add(race)
+        db.session.flush()
+        UserStats.refresh(user_id)
         db.session.commit()
         return race
     
+    @classmethod
+    def create_batch(cls, user_id, entries):
+        """
+        Create several races for a user in one transaction
+        
+        Args:
+            user_id: ID of the user who owns the races
+            entries: Dicts with race_name, race_date, gpx_file_path and
+                     gpx_sha256
+        
+        Returns:
+            list: The new Race instances, in entry order
+        """
+        races = [cls(user_id=user_id, is_processed=False, **entry) for entry in entries]
+        db.session.add_all(races)
+        db.session.flush()
+        UserStats.refresh(user_id)
+        db.session.commit()
+        return races
+    
     def delete_with_data(self):
         """
         Delete this race and all associated data
@@ -140,13 +296,18 @@ class Race(db.Model):
         Returns:
             bool: True if successful, False otherwise
         """
+        from app.utils.track_tiles import clear_race_tiles
         try:
             # Delete the GPX file
             self.delete_gpx_file()
+            clear_race_tiles(self.race_id)
             
             # The relationships with cascade='all, delete-orphan' will 
             # handle deletion of related records automatically
+            user_id = self.user_id
             db.session.delete(self)
+            db.session.flush()
+            UserStats.refresh(user_id)
             db.session.commit()
             return True
         except Exception as e:
@@ -167,14 +328,17 @@ class Race(db.Model):
             'race_name': self.race_name,
             'race_date': self.race_date.isoformat() if self.race_date else None,
             'wind_direction': self.wind_direction,
+            'crop_start': self.crop_start.isoformat() if self.crop_start else None,
+            'crop_end': self.crop_end.isoformat() if self.crop_end else None,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'is_processed': self.is_processed,
+            'processing_error': self.processing_error,
             'total_distance': self.total_distance,
             'duration': self.duration,
             'duration_formatted': self.duration_formatted,
             'max_speed': self.max_speed,
             'avg_speed': self.avg_speed,
-            'track_point_count': self.track_points.count() if self.track_points else 0,
-            'mark_count': self.marks.count() if self.marks else 0
+            'track_point_count': self.track_point_count or 0,
+            'mark_count': self.mark_count or 0
         }
\ No newline at end of file
@@ -60,9 +60,37 @@ class RaceMark(db.Model):
             name=name
         )
         db.session.add(new_mark)
+        db.session.flush()
+        cls.refresh_mark_count(race_id)
         db.session.commit()
         return new_mark
     
+    def delete(self):
+        """Delete this mark, keeping the race's mark count in step"""
+        race_id = self.race_id
+        db.session.delete(self)
+        db.session.flush()
+        self.refresh_mark_count(race_id)
+        db.session.commit()
+    
+    @classmethod
+    def refresh_mark_count(cls, race_id):
+        """
+        Recount a race's marks into its denormalized mark_count
+        
+        Counted from the marks themselves rather than incremented, so
+        the count cannot drift however marks are added or removed. The
+        caller commits.
+        """
+        from app.models.race import Race
+        count = db.session.query(db.func.count(cls.mark_id)).filter(
+            cls.race_id == race_id
+        ).scalar_subquery()
+        db.session.query(Race).filter_by(race_id=race_id).update(
+            {Race.mark_count: count},
+            synchronize_session=False
+        )
+    
     def to_dict(self):
         """Convert mark to dictionary for API responses"""
         return {
@@ -59,28 +59,41 @@ class RaceSegment(db.Model):
     @classmethod
     def get_segment_stats_by_type(cls, race_id):
         """Get aggregate statistics for each segment type"""
+        return cls.get_segment_stats_for_races([race_id]).get(race_id, {})
+    
+    @classmethod
+    def get_segment_stats_for_races(cls, race_ids):
+        """
+        Get aggregate segment statistics by type for many races in one query
+        
+        Args:
+            race_ids: IDs of the races
+        
+        Returns:
+            dict: Stats by segment type value, by race ID; races with no
+                  segments are left out
+        """
         from sqlalchemy import func
         
+        rows = db.session.query(
+            cls.race_id,
+            cls.segment_type,
+            func.count(cls.segment_id).label('count'),
+            func.sum(cls.distance).label('total_distance'),
+            func.avg(cls.avg_speed).label('avg_speed'),
+            func.avg(cls.avg_vmg).label('avg_vmg')
+        ).filter(
+            cls.race_id.in_(list(race_ids))
+        ).group_by(cls.race_id, cls.segment_type).all()
+        
         stats = {}
-        for segment_type in SegmentType:
-            # Get aggregate data for this segment type
-            result = db.session.query(
-                func.count(cls.segment_id).label('count'),
-                func.sum(cls.distance).label('total_distance'),
-                func.avg(cls.avg_speed).label('avg_speed'),
-                func.avg(cls.avg_vmg).label('avg_vmg')
-            ).filter_by(
-                race_id=race_id,
-                segment_type=segment_type
-            ).first()
-            
-            if result and result.count:
-                stats[segment_type.value] = {
-                    'count': result.count,
-                    'total_distance': result.total_distance,
-                    'avg_speed': result.avg_speed,
-                    'avg_vmg': result.avg_vmg
-                }
+        for row in rows:
+            stats.setdefault(row.race_id, {})[row.segment_type.value] = {
+                'count': row.count,
+                'total_distance': row.total_distance,
+                'avg_speed': row.avg_speed,
+                'avg_vmg': row.avg_vmg
+            }
         
         return stats
     
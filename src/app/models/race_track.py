@@ -0,0 +1,170 @@
+from datetime import datetime, timedelta
+from collections import namedtuple
+import numpy as np
+from app import db
+
+# Packed column layout: name and little-endian dtype, stored in this order
+TRACK_LAYOUT = (
+    ('latitude', np.dtype('<f8')),
+    ('longitude', np.dtype('<f8')),
+    ('timestamp', np.dtype('<i8')),  # Epoch milliseconds (UTC)
+    ('elevation', np.dtype('<f4')),
+    ('speed', np.dtype('<f4')),
+    ('heading', np.dtype('<f4')),
+    ('vmg', np.dtype('<f4')),
+    ('true_wind_angle', np.dtype('<f4'))
+)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Read-only point record with the same attribute names as TrackPoint;
+# point_id is only known for row storage and is None otherwise
+TrackPointRecord = namedtuple('TrackPointRecord', [
+    'race_id', 'point_index', 'latitude', 'longitude', 'elevation', 'timestamp',
+    'speed', 'heading', 'vmg', 'true_wind_angle', 'point_id'
+], defaults=(None,))
+
+
+def datetime_to_epoch_ms(value):
+    """Convert a naive UTC datetime to epoch milliseconds"""
+    return (value - EPOCH) // timedelta(milliseconds=1)
+
+
+def epoch_ms_to_datetime(value):
+    """Convert epoch milliseconds to a naive UTC datetime"""
+    return EPOCH + timedelta(milliseconds=int(value))
+
+
+class TrackView:
+    """
+    Zero-copy columnar view over a race's packed track
+    
+    Columns are numpy arrays sharing the stored blob's memory. Slicing
+    returns another view; iterating yields TrackPointRecord objects so code
+    written against TrackPoint rows keeps working.
+    """
+    
+    def __init__(self, race_id, columns, start_index=0):
+        self.race_id = race_id
+        self.columns = columns
+        self.start_index = start_index
+    
+    def __len__(self):
+        return len(self.columns['timestamp'])
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, _, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("TrackView slices must be contiguous")
+            return TrackView(
+                self.race_id,
+                {name: column[key] for name, column in self.columns.items()},
+                self.start_index + start
+            )
+        
+        index = range(len(self))[key]
+        return self._record(index)
+    
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._record(index)
+    
+    def __getattr__(self, name):
+        # Expose columns as attributes (view.latitude, view.speed, ...)
+        columns = self.__dict__.get('columns', {})
+        if name in columns:
+            return columns[name]
+        raise AttributeError(name)
+    
+    def _record(self, index):
+        """Build the TrackPointRecord for a position in this view"""
+        values = {}
+        for name, column in self.columns.items():
+            value = column[index].item()
+            if name == 'timestamp':
+                value = epoch_ms_to_datetime(value)
+            elif value != value:  # NaN marks a missing value
+                value = None
+            values[name] = value
+        
+        return TrackPointRecord(
+            race_id=self.race_id,
+            point_index=self.start_index + index,
+            **values
+        )
+    
+    def slice_time(self, start_time, end_time):
+        """Get the contiguous sub-view between two naive UTC datetimes"""
+        timestamps = self.columns['timestamp']
+        start = np.searchsorted(timestamps, datetime_to_epoch_ms(start_time), side='left')
+        end = np.searchsorted(timestamps, datetime_to_epoch_ms(end_time), side='right')
+        return self[start:end]
+
+
+class RaceTrack(db.Model):
+    """Model for storing a race's whole track as one packed columnar blob"""
+    __tablename__ = 'race_tracks'
+    
+    race_id = db.Column(db.Integer, db.ForeignKey('races.race_id'), primary_key=True)
+    point_count = db.Column(db.Integer, nullable=False)
+    data = db.Column(db.LargeBinary, nullable=False)  # Columns packed per TRACK_LAYOUT
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __init__(self, **kwargs):
+        super(RaceTrack, self).__init__(**kwargs)
+    
+    @staticmethod
+    def pack(columns):
+        """
+        Pack track columns into a single blob
+        
+        Args:
+            columns: Dict of column name to array; 'timestamp' is epoch
+                     milliseconds and missing optional columns become NaN
+        
+        Returns:
+            tuple: (point_count, packed bytes)
+        """
+        point_count = len(columns['timestamp'])
+        parts = []
+        for name, dtype in TRACK_LAYOUT:
+            column = columns.get(name)
+            if column is None:
+                column = np.full(point_count, np.nan)
+            parts.append(np.ascontiguousarray(column, dtype=dtype).tobytes())
+        return point_count, b''.join(parts)
+    
+    @staticmethod
+    def unpack(point_count, data):
+        """Get zero-copy column arrays over a packed blob"""
+        columns = {}
+        offset = 0
+        for name, dtype in TRACK_LAYOUT:
+            columns[name] = np.frombuffer(data, dtype=dtype, count=point_count, offset=offset)
+            offset += dtype.itemsize * point_count
+        return columns
+    
+    @classmethod
+    def store(cls, race_id, columns):
+        """Create or replace the packed track for a race (caller commits)"""
+        point_count, data = cls.pack(columns)
+        track = db.session.get(cls, race_id)
+        if track is None:
+            track = cls(race_id=race_id)
+            db.session.add(track)
+        track.point_count = point_count
+        track.data = data
+        return track
+    
+    @classmethod
+    def get_view(cls, race_id):
+        """Load a race's track in a single fetch as a TrackView"""
+        row = db.session.query(cls.point_count, cls.data).filter_by(race_id=race_id).first()
+        if row is None:
+            return TrackView(race_id, cls.unpack(0, b''))
+        return TrackView(race_id, cls.unpack(row.point_count, row.data))
+    
+    def __repr__(self):
+        return f'<RaceTrack race {self.race_id} ({self.point_count} points)>'
\ No newline at end of file
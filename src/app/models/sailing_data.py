@@ -1,6 +1,7 @@
 from datetime import datetime
 import json
 from app import db
+from app.utils.point_codec import decode_points, decode_point_dicts
 
 class SailingSession(db.Model):
     """Model for storing sailing sessions data from GPX files"""
@@ -13,7 +14,8 @@ class SailingSession(db.Model):
     distance = db.Column(db.Float)    # Distance in kilometers
     max_speed = db.Column(db.Float)   # Max speed in knots
     avg_speed = db.Column(db.Float)   # Average speed in knots
-    points_json = db.Column(db.Text)  # JSON string of GPS points
+    points_json = db.Column(db.Text)  # Legacy JSON string of GPS points
+    points_data = db.Column(db.LargeBinary)  # GPS points encoded by point_codec
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Foreign key to User
@@ -24,8 +26,26 @@ class SailingSession(db.Model):
     
     @property
     def points(self):
-        """Deserialize points_json to Python object"""
-        return json.loads(self.points_json) if self.points_json else []
+        """Decode the stored points, caching the result until they change"""
+        source = self.points_data or self.points_json
+        cached = self.__dict__.get('_points_cache')
+        if cached is not None and cached[0] is source:
+            return cached[1]
+        
+        if self.points_data:
+            points = decode_point_dicts(self.points_data)
+        elif self.points_json:
+            points = json.loads(self.points_json)
+        else:
+            points = []
+        
+        self.__dict__['_points_cache'] = (source, points)
+        return points
+    
+    @property
+    def point_columns(self):
+        """Decode the stored points straight into numpy arrays (binary encoding only)"""
+        return decode_points(self.points_data) if self.points_data else None
     
     @property
     def duration_formatted(self):
@@ -1,4 +1,10 @@
 from datetime import datetime
+import csv
+import io
+import math
+import time
+import numpy as np
+from flask import current_app
 from app import db
 
 class TrackPoint(db.Model):
@@ -29,29 +35,262 @@ class TrackPoint(db.Model):
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Keyset pagination walks a race's points in point_index order
+        db.Index('ix_track_points_race_id_point_index', 'race_id', 'point_index'),
+    )
+    
+    # Per-point columns that can be requested from the points API
+    API_COLUMNS = (
+        'latitude', 'longitude', 'elevation', 'timestamp',
+        'speed', 'heading', 'vmg', 'true_wind_angle'
+    )
+    
+    # Columns written by bulk_insert, in COPY order
+    BULK_COLUMNS = (
+        'race_id', 'latitude', 'longitude', 'elevation', 'timestamp',
+        'speed', 'heading', 'vmg', 'true_wind_angle', 'point_index', 'created_at'
+    )
+    BULK_BATCH_SIZE = 10000
+    
     def __init__(self, **kwargs):
         super(TrackPoint, self).__init__(**kwargs)
     
+    @classmethod
+    def bulk_insert(cls, race_id, rows, batch_size=None):
+        """
+        Insert a race's track points in large batches
+        
+        Skips the ORM entirely: rows go out through executemany, or COPY on
+        PostgreSQL. Everything runs in the current session transaction, so
+        the caller commits (or rolls back) the whole race at once.
+        
+        Args:
+            race_id: ID of the race the points belong to
+            rows: Iterable of dicts keyed by column name (race_id and
+                  created_at are filled in)
+            batch_size: Number of rows per batch
+            
+        Returns:
+            dict: 'rows' inserted, 'seconds' taken and 'rows_per_second'
+        """
+        batch_size = batch_size or cls.BULK_BATCH_SIZE
+        connection = db.session.connection()
+        use_copy = connection.dialect.name == 'postgresql'
+        created_at = datetime.utcnow()
+        
+        started = time.perf_counter()
+        row_count = 0
+        batch = []
+        for row in rows:
+            row = dict(row, race_id=race_id, created_at=created_at)
+            batch.append(row)
+            if len(batch) >= batch_size:
+                row_count += cls._insert_batch(connection, batch, use_copy)
+                batch = []
+        if batch:
+            row_count += cls._insert_batch(connection, batch, use_copy)
+        
+        seconds = time.perf_counter() - started
+        rows_per_second = row_count / seconds if seconds > 0 else float(row_count)
+        current_app.logger.info(
+            f'Inserted {row_count} track points for race {race_id} '
+            f'in {seconds:.2f}s ({rows_per_second:.0f} rows/s)'
+        )
+        
+        return {
+            'rows': row_count,
+            'seconds': seconds,
+            'rows_per_second': rows_per_second
+        }
+    
+    @classmethod
+    def _insert_batch(cls, connection, batch, use_copy):
+        """Write one batch of rows with COPY or executemany"""
+        if use_copy:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in batch:
+                writer.writerow([
+                    '' if row.get(column) is None else row[column]
+                    for column in cls.BULK_COLUMNS
+                ])
+            buffer.seek(0)
+            
+            cursor = connection.connection.cursor()
+            try:
+                cursor.copy_expert(
+                    f"COPY {cls.__tablename__} ({', '.join(cls.BULK_COLUMNS)}) "
+                    f"FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+            finally:
+                cursor.close()
+        else:
+            connection.execute(cls.__table__.insert(), [
+                {column: row.get(column) for column in cls.BULK_COLUMNS}
+                for row in batch
+            ])
+        
+        return len(batch)
+    
+    @classmethod
+    def bulk_update(cls, point_ids, values, batch_size=None):
+        """
+        Update columns of many track points in one bulk statement per batch
+        
+        Uses UPDATE ... FROM (VALUES ...) on PostgreSQL and executemany
+        elsewhere. The caller commits.
+        
+        Args:
+            point_ids: Array of point IDs to update
+            values: Dict of column name to array of new values, aligned
+                    with point_ids (NaN is stored as NULL)
+            batch_size: Number of rows per batch
+        
+        Returns:
+            int: Number of rows updated
+        """
+        batch_size = batch_size or cls.BULK_BATCH_SIZE
+        connection = db.session.connection()
+        names = list(values)
+        
+        point_ids = [int(point_id) for point_id in point_ids]
+        columns = [
+            [None if value != value else value for value in np.asarray(values[name], dtype=np.float64).tolist()]
+            for name in names
+        ]
+        
+        if connection.dialect.name == 'postgresql':
+            from psycopg2.extras import execute_values
+            
+            assignments = ', '.join(f'{name} = v.{name}' for name in names)
+            cursor = connection.connection.cursor()
+            try:
+                execute_values(
+                    cursor,
+                    f"UPDATE {cls.__tablename__} AS t SET {assignments} "
+                    f"FROM (VALUES %s) AS v(point_id, {', '.join(names)}) "
+                    f"WHERE t.point_id = v.point_id",
+                    list(zip(point_ids, *columns)),
+                    template=f"(%s, {', '.join(['%s::double precision'] * len(names))})",
+                    page_size=batch_size
+                )
+            finally:
+                cursor.close()
+        else:
+            # Straight to the driver's executemany; building SQLAlchemy
+            # parameters per row costs more than the update itself
+            placeholder = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+            statement = (
+                f"UPDATE {cls.__tablename__} SET "
+                f"{', '.join(f'{name} = {placeholder}' for name in names)} "
+                f"WHERE point_id = {placeholder}"
+            )
+            rows = list(zip(*columns, point_ids))
+            for start in range(0, len(rows), batch_size):
+                connection.exec_driver_sql(statement, rows[start:start + batch_size])
+        
+        return len(point_ids)
+    
+    @staticmethod
+    def uses_columnar_storage():
+        """Check whether tracks are stored as packed RaceTrack blobs"""
+        return current_app.config.get('TRACK_STORAGE') == 'columnar'
+    
     @classmethod
     def get_points_by_race(cls, race_id, limit=None, offset=None):
         """Get track points for a race, with optional pagination"""
-        query = cls.query.filter_by(race_id=race_id).order_by(cls.timestamp)
+        if cls.uses_columnar_storage():
+            from app.models.race_track import RaceTrack
+            start = offset or 0
+            end = start + limit if limit else None
+            return RaceTrack.get_view(race_id)[start:end]
         
+        # point_index runs 0..n-1, so an offset is a seek on the
+        # (race_id, point_index) index rather than a scan past skipped rows
+        query = cls.query.filter_by(race_id=race_id).order_by(cls.point_index)
+        
+        if offset:
+            query = query.filter(cls.point_index >= offset)
         if limit:
             query = query.limit(limit)
-        if offset:
-            query = query.offset(offset)
             
         return query.all()
     
+    @classmethod
+    def get_point_page(cls, race_id, columns, after_index=None, limit=None):
+        """
+        Get one page of a race's points as column arrays
+        
+        Pages are keyed on point_index: pass the last point_index of the
+        previous page as after_index to get the next one.
+        
+        Args:
+            race_id: ID of the race
+            columns: Names from API_COLUMNS to include
+            after_index: Only return points with a greater point_index
+            limit: Maximum number of points in the page
+        
+        Returns:
+            dict: 'point_index' plus each requested column as a numpy array
+                  (timestamps in epoch milliseconds, missing values NaN)
+        """
+        if cls.uses_columnar_storage():
+            from app.utils.track_index import TrackTimeIndex
+            view = TrackTimeIndex.for_race(race_id).view
+            start = 0 if after_index is None else max(after_index + 1, 0)
+            end = start + limit if limit else None
+            page = view[start:end]
+            
+            result = {'point_index': np.arange(page.start_index, page.start_index + len(page))}
+            for column in columns:
+                result[column] = page.columns[column]
+            return result
+        
+        from app.models.race_track import datetime_to_epoch_ms
+        
+        query = db.session.query(
+            cls.point_index,
+            *[getattr(cls, column) for column in columns]
+        ).filter(cls.race_id == race_id)
+        if after_index is not None:
+            query = query.filter(cls.point_index > after_index)
+        query = query.order_by(cls.point_index)
+        if limit:
+            query = query.limit(limit)
+        
+        rows = query.all()
+        values = list(zip(*rows)) if rows else [()] * (len(columns) + 1)
+        
+        result = {'point_index': np.array(values[0], dtype=np.int64)}
+        for column, column_values in zip(columns, values[1:]):
+            if column == 'timestamp':
+                result[column] = np.array(
+                    [datetime_to_epoch_ms(value) for value in column_values],
+                    dtype=np.int64
+                )
+            else:
+                # None becomes NaN
+                result[column] = np.array(column_values, dtype=np.float64)
+        return result
+    
     @classmethod
     def get_point_count(cls, race_id):
         """Get total number of points for a race"""
+        if cls.uses_columnar_storage():
+            from app.models.race_track import RaceTrack
+            return db.session.query(RaceTrack.point_count).filter_by(race_id=race_id).scalar() or 0
+        
         return cls.query.filter_by(race_id=race_id).count()
     
     @classmethod
     def get_points_in_timerange(cls, race_id, start_time, end_time):
         """Get points between start and end times"""
+        if cls.uses_columnar_storage():
+            from app.models.race_track import RaceTrack
+            return RaceTrack.get_view(race_id).slice_time(start_time, end_time)
+        
         return cls.query.filter(
             cls.race_id == race_id,
             cls.timestamp >= start_time,
@@ -59,41 +298,48 @@ class TrackPoint(db.Model):
         ).order_by(cls.timestamp).all()
     
     @classmethod
-    def get_point_at_time(cls, race_id, timestamp):
-        """Get the point closest to the given timestamp"""
-        # First try exact match
-        point = cls.query.filter_by(race_id=race_id, timestamp=timestamp).first()
-        if point:
-            return point
-        
-        # Otherwise get closest before and after
-        before = cls.query.filter(
-            cls.race_id == race_id,
-            cls.timestamp <= timestamp
-        ).order_by(cls.timestamp.desc()).first()
+    def get_point_at_time(cls, race_id, timestamp, track_updated_at=None):
+        """
+        Get the point closest to the given timestamp
         
-        after = cls.query.filter(
-            cls.race_id == race_id,
-            cls.timestamp >= timestamp
-        ).order_by(cls.timestamp).first()
+        Answered from the cached TrackTimeIndex; pass the race's
+        track_updated_at when it is at hand and no query is made at all.
+        The result is a read-only TrackPointRecord, not a mapped TrackPoint,
+        whatever the storage backend; with row storage its point_id is set,
+        so db.session.get(TrackPoint, record.point_id) loads the row when an
+        ORM instance is really needed.
+        
+        Returns:
+            TrackPointRecord: The nearest point, or None for an empty track
+        """
+        from app.utils.track_index import TrackTimeIndex
         
-        # Return closest of the two
-        if not before:
-            return after
-        if not after:
-            return before
+        index = TrackTimeIndex.for_race(race_id, track_updated_at)
+        position = index.nearest(timestamp)
+        if position is None:
+            return None
+        return index.record(position)
+    
+    @classmethod
+    def get_points_at_times(cls, race_id, timestamps, track_updated_at=None):
+        """
+        Get the points closest to each of the given timestamps, in order
         
-        before_diff = (timestamp - before.timestamp).total_seconds()
-        after_diff = (after.timestamp - timestamp).total_seconds()
+        Returns:
+            list: TrackPointRecord per timestamp (see get_point_at_time)
+        """
+        from app.utils.track_index import TrackTimeIndex
         
-        return before if before_diff <= after_diff else after
+        index = TrackTimeIndex.for_race(race_id, track_updated_at)
+        if not len(index):
+            return [None] * len(timestamps)
+        return [index.record(position) for position in index.nearest_batch(timestamps).tolist()]
     
     def calculate_vmg(self, wind_direction):
         """Calculate VMG based on current speed, heading and wind direction"""
         if self.speed is None or self.heading is None or wind_direction is None:
             return None
         
-        import math
         # Calculate the true wind angle (angle between boat heading and wind)
         wind_angle = abs((self.heading - wind_direction + 180) % 360 - 180)
         
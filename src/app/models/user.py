@@ -19,6 +19,7 @@ class User(UserMixin, db.Model):
     
     # One-to-many: a user can have many races
     races = db.relationship('Race', backref='user', lazy='dynamic', cascade='all, delete-orphan')
+    stats = db.relationship('UserStats', backref='user', uselist=False, cascade='all, delete-orphan')
     
     def __init__(self, **kwargs):
         super(User, self).__init__(**kwargs)
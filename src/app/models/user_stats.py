@@ -0,0 +1,76 @@
+from datetime import datetime
+from sqlalchemy.exc import IntegrityError
+from app import db
+
+class UserStats(db.Model):
+    """Model for per-user race totals maintained for the dashboard"""
+    __tablename__ = 'user_stats'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    race_count = db.Column(db.Integer, nullable=False, default=0)
+    total_distance = db.Column(db.Float, nullable=False, default=0)  # In nautical miles
+    max_speed = db.Column(db.Float, nullable=False, default=0)       # In knots
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __init__(self, **kwargs):
+        super(UserStats, self).__init__(**kwargs)
+    
+    @classmethod
+    def refresh(cls, user_id):
+        """
+        Recompute a user's totals with a single aggregate over their races
+        
+        Called whenever a race is created, processed or deleted, possibly by
+        several worker processes at once. The stats row is locked before the
+        aggregate runs, so a concurrent refresh waits for this transaction
+        and then counts its races too instead of committing stale totals.
+        The caller commits, which releases the lock.
+        
+        Args:
+            user_id: ID of the user whose totals changed
+        
+        Returns:
+            UserStats: The updated stats row
+        """
+        from app.models.race import Race
+        
+        stats = cls._lock_for_user(user_id)
+        
+        row = db.session.query(
+            db.func.count(Race.race_id).label('race_count'),
+            db.func.coalesce(db.func.sum(Race.total_distance), 0).label('total_distance'),
+            db.func.coalesce(db.func.max(Race.max_speed), 0).label('max_speed')
+        ).filter(Race.user_id == user_id).one()
+        
+        stats.race_count = row.race_count
+        stats.total_distance = row.total_distance
+        stats.max_speed = row.max_speed
+        return stats
+    
+    @classmethod
+    def _lock_for_user(cls, user_id):
+        """Get a user's stats row locked FOR UPDATE, creating it if needed"""
+        query = cls.query.filter_by(user_id=user_id).with_for_update().populate_existing()
+        stats = query.one_or_none()
+        if stats is not None:
+            return stats
+        
+        # Another worker may create the row first; then lock theirs
+        try:
+            with db.session.begin_nested():
+                db.session.add(cls(user_id=user_id))
+        except IntegrityError:
+            pass
+        return query.one()
+    
+    @classmethod
+    def get_for_user(cls, user_id):
+        """Get a user's totals, building them on first use"""
+        stats = db.session.get(cls, user_id)
+        if stats is None:
+            stats = cls.refresh(user_id)
+            db.session.commit()
+        return stats
+    
+    def __repr__(self):
+        return f'<UserStats user {self.user_id} ({self.race_count} races)>'
\ No newline at end of file
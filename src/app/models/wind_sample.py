@@ -0,0 +1,64 @@
+from datetime import datetime
+import numpy as np
+from app import db
+
+class WindSample(db.Model):
+    """Model for one timestamped wind observation in a race's wind timeline"""
+    __tablename__ = 'race_wind_samples'
+    
+    sample_id = db.Column(db.Integer, primary_key=True)
+    race_id = db.Column(db.Integer, db.ForeignKey('races.race_id'), index=True)
+    timestamp = db.Column(db.DateTime, nullable=False)
+    direction = db.Column(db.Float, nullable=False)  # Direction the wind blows from, in degrees
+    speed = db.Column(db.Float)                      # In knots, nullable
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_race_wind_samples_race_id_timestamp', 'race_id', 'timestamp'),
+    )
+    
+    def __init__(self, **kwargs):
+        super(WindSample, self).__init__(**kwargs)
+    
+    @classmethod
+    def get_samples_by_race(cls, race_id):
+        """Get a race's wind samples in time order"""
+        return cls.query.filter_by(race_id=race_id).order_by(cls.timestamp).all()
+    
+    @classmethod
+    def get_timeline(cls, race_id):
+        """
+        Get a race's wind timeline as arrays in a single query
+        
+        Returns:
+            tuple: (epoch-millisecond times, directions, speeds) arrays in
+                   time order; speeds are NaN where not recorded
+        """
+        from app.models.race_track import datetime_to_epoch_ms
+        
+        rows = db.session.query(
+            cls.timestamp,
+            cls.direction,
+            cls.speed
+        ).filter_by(race_id=race_id).order_by(cls.timestamp).all()
+        
+        times, directions, speeds = zip(*rows) if rows else ((), (), ())
+        return (
+            np.array([datetime_to_epoch_ms(time) for time in times], dtype=np.int64),
+            np.array(directions, dtype=np.float64),
+            np.array(speeds, dtype=np.float64)
+        )
+    
+    def to_dict(self):
+        """Convert wind sample to dictionary for API responses"""
+        return {
+            'sample_id': self.sample_id,
+            'race_id': self.race_id,
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'direction': self.direction,
+            'speed': self.speed
+        }
+    
+    def __repr__(self):
+        return f'<WindSample {self.direction:.0f}° at {self.timestamp}>'
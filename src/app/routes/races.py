@@ -1,9 +1,27 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, abort, current_app, Response, stream_with_context
 from flask_login import login_required, current_user
-from app import db
+from app import db, race_queue
 from app.models.race import Race
 from app.forms.race import RaceUploadForm
-from app.utils.file_utils import save_gpx_file
+from app.utils.file_utils import ingest_gpx_file
+from app.utils.race_processor import update_wind_direction
+from app.utils.wind_model import add_wind_sample, update_wind_sample, delete_wind_sample
+from app.utils.race_stats import get_race_stats, combine_race_stats
+from app.utils.track_window import get_window_stats
+from app.utils.batch_upload import ingest_batch
+from app.utils.fleet_compare import FleetAlignment
+from app.utils.maneuver_analytics import (
+    WIND_BAND_NAMES, get_user_maneuver_analytics, get_ranked_maneuvers, parse_maneuver_type
+)
+from app.models.wind_sample import WindSample
+from datetime import datetime, timezone
+import math
+from app.models.race_track import datetime_to_epoch_ms
+from app.utils.track_simplify import simplify_race_track
+from app.utils.track_tiles import MAX_TILE_ZOOM, get_race_tile
+from app.utils.point_stream import (
+    parse_point_columns, parse_point_range, iter_point_pages, point_record_dtype, iter_ndjson, iter_binary
+)
 import os
 
 races = Blueprint('races', __name__)
@@ -21,23 +39,53 @@ def upload_race():
     """Upload a new race GPX file"""
     form = RaceUploadForm()
     if form.validate_on_submit():
-        # Save the GPX file
-        success, result = save_gpx_file(form.gpx_file.data, current_user.id)
+        # Save the GPX file by content, parsing it only if it is new
+        success, result = ingest_gpx_file(form.gpx_file.data, current_user.id)
         
         if not success:
             flash(f'Error uploading file: {result}', 'danger')
             return render_template('races/upload.html', form=form)
         
-        # Create new race
+        # The same file again links to the race already made from it
+        if result['race'] is not None:
+            flash(f'This GPX file was already uploaded as "{result["race"].race_name}".', 'info')
+            return redirect(url_for('races.view_race', race_id=result['race'].race_id))
+        
+        # Create new race and hand the parsed track to the background queue
         try:
-            race = Race.create_from_form(form, current_user.id, result)
-            flash('Race uploaded successfully!', 'success')
+            race = Race.create_from_form(form, current_user.id, result['file_path'], result['sha256'])
+            race_queue.submit(race.race_id, result['columns'])
+            flash('Race uploaded successfully! Analysis is running in the background.', 'success')
             return redirect(url_for('races.view_race', race_id=race.race_id))
         except Exception as e:
             flash(f'Error creating race: {str(e)}', 'danger')
     
     return render_template('races/upload.html', form=form)
 
+@races.route('/api/races/batch', methods=['POST'])
+@login_required
+def upload_race_batch():
+    """Upload many GPX files (or zips of them) as one race each"""
+    files = [f for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        return jsonify({'error': 'No files uploaded'}), 400
+    
+    race_date = None
+    if request.form.get('race_date'):
+        try:
+            race_date = datetime.strptime(request.form['race_date'], '%Y-%m-%d')
+        except ValueError:
+            return jsonify({'error': 'race_date must be YYYY-MM-DD'}), 400
+    wait = request.form.get('wait', '').lower() in ('1', 'true', 'yes')
+    
+    report = ingest_batch([(f.filename, f.stream) for f in files], current_user.id, race_date, wait)
+    return jsonify({
+        'files': report,
+        'accepted': sum(1 for entry in report if entry['status'] not in ('rejected', 'duplicate')),
+        'duplicates': sum(1 for entry in report if entry['status'] == 'duplicate'),
+        'rejected': sum(1 for entry in report if entry['status'] == 'rejected')
+    })
+
 @races.route('/races/<int:race_id>')
 @login_required
 def view_race(race_id):
@@ -81,4 +129,394 @@ def race_json(race_id):
     if race.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    return jsonify(race.to_dict())
\ No newline at end of file
+    return jsonify(race.to_dict())
+
+def _parse_race_ids(value):
+    """
+    Parse a comma-separated race_ids query parameter
+    
+    Raises:
+        ValueError: If a value is not an integer
+    """
+    try:
+        return [int(part) for part in value.split(',') if part.strip()]
+    except ValueError:
+        raise ValueError('race_ids must be comma-separated integers') from None
+
+@races.route('/api/races/stats')
+@login_required
+def races_stats():
+    """Get maneuver and segment statistics per race and combined, e.g. for a season"""
+    query = db.session.query(Race.race_id).filter(Race.user_id == current_user.id)
+    if request.args.get('race_ids'):
+        try:
+            race_ids = _parse_race_ids(request.args['race_ids'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(Race.race_id.in_(race_ids))
+    
+    # Only the user's own races; others are silently left out
+    stats = get_race_stats([race_id for race_id, in query.all()])
+    return jsonify({
+        'races': {str(race_id): race_stats for race_id, race_stats in stats.items()},
+        'combined': combine_race_stats(stats)
+    })
+
+def _get_fleet_alignment():
+    """
+    Get the aligned tracks for the fleet in the request's race_ids
+    
+    Returns:
+        tuple: (FleetAlignment, None) or (None, error response)
+    """
+    try:
+        race_ids = _parse_race_ids(request.args.get('race_ids', ''))
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    if not race_ids:
+        return None, (jsonify({'error': 'race_ids is required'}), 400)
+    
+    owners = dict(db.session.query(Race.race_id, Race.user_id).filter(Race.race_id.in_(race_ids)).all())
+    if len(owners) != len(set(race_ids)):
+        return None, (jsonify({'error': 'Race not found'}), 404)
+    # Check that every race belongs to the current user
+    if any(user_id != current_user.id for user_id in owners.values()):
+        return None, (jsonify({'error': 'Unauthorized'}), 403)
+    
+    step = request.args.get('step', 1.0, type=float)
+    if not step or step <= 0:
+        return None, (jsonify({'error': 'step must be a positive number of seconds'}), 400)
+    
+    try:
+        return FleetAlignment.for_races(race_ids, step, current_app.config['FLEET_MAX_GRID_POINTS']), None
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+
+@races.route('/api/fleet')
+@login_required
+def fleet_comparison():
+    """Get several races' tracks aligned on a shared time grid with gaps to the leader"""
+    alignment, error = _get_fleet_alignment()
+    if error:
+        return error
+    return jsonify(alignment.to_dict())
+
+@races.route('/api/fleet/snapshot')
+@login_required
+def fleet_snapshot():
+    """Get every boat's position, gap and VMG delta at one time, for scrubbing"""
+    alignment, error = _get_fleet_alignment()
+    if error:
+        return error
+    
+    time_ms = alignment.grid[0]
+    if request.args.get('time'):
+        try:
+            time_ms = datetime_to_epoch_ms(_parse_timestamp(request.args['time']))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    return jsonify(alignment.snapshot(time_ms))
+
+@races.route('/api/maneuvers/analytics')
+@login_required
+def maneuver_analytics():
+    """Get maneuver averages and distributions by type and wind band across all the user's races"""
+    maneuver_type = None
+    if request.args.get('type'):
+        try:
+            maneuver_type = parse_maneuver_type(request.args['type'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+    
+    return jsonify(get_user_maneuver_analytics(current_user.id, maneuver_type))
+
+@races.route('/api/maneuvers/ranked')
+@login_required
+def ranked_maneuvers():
+    """Get the user's best or worst maneuvers of a type across all their races"""
+    try:
+        maneuver_type = parse_maneuver_type(request.args.get('type', 'tack'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    order = request.args.get('order', 'best')
+    if order not in ('best', 'worst'):
+        return jsonify({'error': 'order must be best or worst'}), 400
+    wind_band = request.args.get('wind_band')
+    if wind_band is not None and wind_band not in WIND_BAND_NAMES:
+        return jsonify({'error': f'wind_band must be one of {", ".join(WIND_BAND_NAMES)}'}), 400
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+    
+    ranked = get_ranked_maneuvers(current_user.id, maneuver_type, order == 'best', limit, wind_band)
+    return jsonify([
+        dict(maneuver.to_dict(), race_name=race_name)
+        for maneuver, race_name in ranked
+    ])
+
+@races.route('/api/races/<int:race_id>/stats')
+@login_required
+def race_stats(race_id):
+    """Get maneuver and segment statistics by type for a race"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    return jsonify(get_race_stats([race_id])[race_id])
+
+@races.route('/api/races/<int:race_id>/track')
+@login_required
+def race_track_json(race_id):
+    """Get the race track simplified for map rendering"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # Never send more vertices than the configured budget
+    budget = current_app.config['TRACK_VERTEX_BUDGET']
+    max_points = max(1, min(request.args.get('max_points', budget, type=int) or budget, budget))
+    
+    track = simplify_race_track(
+        race.race_id,
+        zoom=request.args.get('zoom', type=int),
+        tolerance=request.args.get('tolerance', type=float),
+        max_points=max_points,
+        track_updated_at=race.track_updated_at
+    )
+    track['race_id'] = race.race_id
+    return jsonify(track)
+
+@races.route('/api/races/<int:race_id>/points')
+@login_required
+def race_points(race_id):
+    """
+    Stream a race's track points
+    
+    Query parameters:
+        after: Only points with a greater point_index (keyset cursor)
+        limit: Maximum number of points
+        columns: Comma-separated column names (default: all)
+        format: 'ndjson' (default) or 'binary'
+    """
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        columns = parse_point_columns(request.args.get('columns'))
+        after_index, limit = parse_point_range(request.args.get('after'), request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    output_format = request.args.get('format', 'ndjson')
+    if output_format not in ('ndjson', 'binary'):
+        return jsonify({'error': f"Unknown format: {output_format}"}), 400
+    
+    pages = iter_point_pages(
+        race.race_id,
+        columns,
+        after_index=after_index,
+        limit=limit
+    )
+    headers = {'X-Point-Count': str(race.track_point_count or 0)}
+    
+    if output_format == 'binary':
+        dtype = point_record_dtype(columns)
+        headers['X-Point-Dtype'] = ','.join(
+            f'{name}:{dtype.fields[name][0].str}' for name in dtype.names
+        )
+        return Response(
+            stream_with_context(iter_binary(pages, dtype)),
+            mimetype='application/octet-stream',
+            headers=headers
+        )
+    
+    return Response(
+        stream_with_context(iter_ndjson(pages)),
+        mimetype='application/x-ndjson',
+        headers=headers
+    )
+
+@races.route('/api/races/<int:race_id>/tiles/<int:z>/<int:x>/<int:y>.json')
+@login_required
+def race_tile(race_id, z, x, y):
+    """Get one z/x/y GeoJSON tile of the race track"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if z > MAX_TILE_ZOOM or x >= 2 ** z or y >= 2 ** z:
+        abort(404)
+    
+    tile = get_race_tile(race.race_id, z, x, y, track_updated_at=race.track_updated_at)
+    return Response(tile, mimetype='application/geo+json')
+
+@races.route('/api/races/<int:race_id>/window')
+@login_required
+def race_window(race_id):
+    """Get stats for a time window of the track (the crop window by default)"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    try:
+        start_time = _parse_timestamp(request.args['start']) if request.args.get('start') else None
+        end_time = _parse_timestamp(request.args['end']) if request.args.get('end') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(get_window_stats(race, start_time, end_time))
+
+@races.route('/api/races/<int:race_id>/crop', methods=['GET', 'PUT'])
+@login_required
+def race_crop(race_id):
+    """Get or set the race's crop window; null start and end clear it"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.method == 'PUT':
+        data = request.get_json(silent=True) or {}
+        try:
+            race.set_crop(
+                _parse_timestamp(data['start']) if data.get('start') else None,
+                _parse_timestamp(data['end']) if data.get('end') else None
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        db.session.commit()
+    
+    return jsonify({
+        'race_id': race.race_id,
+        'crop_start': race.crop_start.isoformat() if race.crop_start else None,
+        'crop_end': race.crop_end.isoformat() if race.crop_end else None,
+        'stats': get_window_stats(race)
+    })
+
+@races.route('/api/races/<int:race_id>/wind', methods=['POST'])
+@login_required
+def race_wind(race_id):
+    """Set the race's wind direction and recompute VMG and wind angles"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    data = request.get_json(silent=True) or request.form
+    wind_direction = data.get('wind_direction')
+    if wind_direction is not None and wind_direction != '':
+        try:
+            wind_direction = int(float(wind_direction)) % 360
+        except (TypeError, ValueError, OverflowError):
+            # int() of inf raises OverflowError, of nan ValueError
+            return jsonify({'error': 'wind_direction must be a number of degrees'}), 400
+    else:
+        wind_direction = None
+    
+    point_count = update_wind_direction(race.race_id, wind_direction)
+    
+    return jsonify({
+        'race_id': race.race_id,
+        'wind_direction': wind_direction,
+        'points_updated': point_count
+    })
+
+def _parse_timestamp(value):
+    """Parse an ISO 8601 timestamp into a naive UTC datetime"""
+    timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+def _parse_finite(name, value):
+    """Parse a finite number from a request field, raising ValueError otherwise"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be a number")
+    if not math.isfinite(number):
+        raise ValueError(f"{name} must be a finite number")
+    return number
+
+def _parse_wind_sample(data, partial=False):
+    """
+    Read wind sample fields from a request body
+    
+    Returns:
+        dict: 'timestamp' (naive UTC), 'direction' and 'speed' when given
+    
+    Raises:
+        ValueError: If a field is missing or invalid
+    """
+    values = {}
+    if data.get('timestamp'):
+        values['timestamp'] = _parse_timestamp(data['timestamp'])
+    elif not partial:
+        raise ValueError("timestamp is required")
+    
+    if data.get('direction') not in (None, ''):
+        values['direction'] = _parse_finite('direction', data['direction'])
+    elif not partial:
+        raise ValueError("direction is required")
+    
+    if data.get('speed') not in (None, ''):
+        values['speed'] = _parse_finite('speed', data['speed'])
+    
+    return values
+
+@races.route('/api/races/<int:race_id>/wind/samples', methods=['GET', 'POST'])
+@login_required
+def race_wind_samples(race_id):
+    """List the race's wind timeline, or add a sample to it"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    if request.method == 'GET':
+        return jsonify([sample.to_dict() for sample in WindSample.get_samples_by_race(race.race_id)])
+    
+    try:
+        values = _parse_wind_sample(request.get_json(silent=True) or request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    sample, point_count = add_wind_sample(race, **values)
+    return jsonify(dict(sample.to_dict(), points_updated=point_count)), 201
+
+@races.route('/api/races/<int:race_id>/wind/samples/<int:sample_id>', methods=['PUT', 'DELETE'])
+@login_required
+def race_wind_sample(race_id, sample_id):
+    """Change or remove one sample of the race's wind timeline"""
+    race = Race.query.get_or_404(race_id)
+    
+    # Check if the race belongs to the current user
+    if race.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    sample = WindSample.query.filter_by(race_id=race.race_id, sample_id=sample_id).first_or_404()
+    
+    if request.method == 'DELETE':
+        point_count = delete_wind_sample(race, sample)
+        return jsonify({'sample_id': sample_id, 'points_updated': point_count})
+    
+    try:
+        values = _parse_wind_sample(request.get_json(silent=True) or request.form, partial=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    point_count = update_wind_sample(race, sample, **values)
+    return jsonify(dict(sample.to_dict(), points_updated=point_count))
\ No newline at end of file
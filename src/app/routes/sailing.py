@@ -34,7 +34,7 @@ def upload_gpx():
     #             distance=session_data['distance'],
     #             max_speed=session_data['max_speed'],
     #             avg_speed=session_data['avg_speed'],
-    #             points_json=session_data['points_json'],
+    #             points_data=session_data['points_data'],
     #             user_id=current_user.id
     #         )
     #         db.session.add(sailing_session)
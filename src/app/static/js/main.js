@@ -111,6 +111,56 @@ function initSailingMap(elementId, routePoints, options = {}) {
     };
 }
 
+// Function to overlay a race track from its cached z/x/y GeoJSON tiles,
+// so many races can be drawn at once without loading whole tracks
+function addRaceTileLayer(map, raceId, options = {}) {
+    if (!map || !raceId) {
+        console.error('Missing required parameters for race tile layer');
+        return null;
+    }
+    
+    const style = { color: 'blue', weight: 3, opacity: 0.7, ...options.style };
+    const features = L.layerGroup().addTo(map);
+    const tileFeatures = {};
+    
+    const TrackTiles = L.GridLayer.extend({
+        createTile: function(coords, done) {
+            const tile = document.createElement('div');
+            const key = `${coords.z}/${coords.x}/${coords.y}`;
+            fetch(`/api/races/${raceId}/tiles/${key}.json`)
+                .then(response => response.json())
+                .then(data => {
+                    // Draw only the track lines; points carry data for popups
+                    const layer = L.geoJSON(data, {
+                        style: style,
+                        filter: feature => feature.geometry.type !== 'Point'
+                    });
+                    tileFeatures[key] = layer;
+                    features.addLayer(layer);
+                    done(null, tile);
+                })
+                .catch(error => done(error, tile));
+            
+            return tile;
+        }
+    });
+    
+    const tileLayer = new TrackTiles({ maxZoom: 20 });
+    tileLayer.on('tileunload', function(event) {
+        const key = `${event.coords.z}/${event.coords.x}/${event.coords.y}`;
+        if (tileFeatures[key]) {
+            features.removeLayer(tileFeatures[key]);
+            delete tileFeatures[key];
+        }
+    });
+    tileLayer.addTo(map);
+    
+    return {
+        tileLayer: tileLayer,
+        features: features
+    };
+}
+
 // Function to initialize speed charts (to be implemented with Chart.js)
 function initSpeedChart(elementId, timestamps, speeds, options = {}) {
     if (!elementId || !timestamps || !speeds) {
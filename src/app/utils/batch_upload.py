@@ -0,0 +1,175 @@
+import os
+import zipfile
+from datetime import datetime
+from flask import current_app
+from app import db, race_queue
+from app.models.race import Race
+from app.utils.file_utils import store_gpx_stream, discard_upload, format_size
+
+
+def expand_uploads(files, max_size=None):
+    """
+    Expand uploaded files into the GPX files to ingest
+    
+    Zip archives are opened and each .gpx member inside yielded in turn.
+    Members whose declared size is over max_size are rejected unread;
+    the declared size can lie, so copies are still counted as they are
+    written (see store_gpx_stream).
+    
+    Args:
+        files: Iterable of (filename, binary stream) pairs; zip streams
+               must be seekable
+        max_size: Optional limit on a GPX file's size in bytes
+    
+    Yields:
+        tuple: (filename, stream, error) where stream is None and error
+               says why when the file cannot be ingested
+    """
+    for filename, stream in files:
+        lower_name = filename.lower()
+        if lower_name.endswith('.gpx'):
+            yield filename, stream, None
+            continue
+        if not lower_name.endswith('.zip'):
+            yield filename, None, "File must be a GPX or zip file"
+            continue
+        
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile:
+            yield filename, None, "Invalid zip file"
+            continue
+        
+        with archive:
+            for member in archive.infolist():
+                # Skip folders and the resource forks macOS adds to archives
+                if member.is_dir() or member.filename.startswith('__MACOSX/'):
+                    continue
+                member_name = f'{filename}/{member.filename}'
+                if not member.filename.lower().endswith('.gpx'):
+                    yield member_name, None, "File must be a GPX file"
+                    continue
+                if max_size is not None and member.file_size > max_size:
+                    yield member_name, None, f"File is larger than the {format_size(max_size)} limit"
+                    continue
+                with archive.open(member) as member_stream:
+                    yield member_name, member_stream, None
+
+
+def race_name_for(filename):
+    """Derive a race name from an uploaded file's name"""
+    name = os.path.splitext(os.path.basename(filename))[0].replace('_', ' ').strip()
+    if len(name) < 3:
+        name = f'Race {name}'.strip()
+    return name[:128]
+
+
+def ingest_batch(files, user_id, race_date=None, wait=False):
+    """
+    Ingest many GPX files (or zips of them) as one race each
+    
+    Files are saved to the content-addressed store as they are read.
+    Files the user has uploaded before, or that repeat within the batch,
+    link to the race made from the same data and are not parsed. The rest
+    become races in one transaction, and each is queued as a single pool
+    job that reads its file back from the store, parses and analyzes it;
+    nothing is parsed in the request and no parsed track crosses between
+    processes. A file that turns out not to be a usable GPX track fails
+    like any other processing error, recorded on its race.
+    
+    Each GPX file may be at most MAX_GPX_FILE_SIZE bytes, and once the
+    files saved add up to MAX_BATCH_UPLOAD_SIZE the rest are rejected, so
+    a small zip that inflates enormously cannot fill the disk.
+    
+    Args:
+        files: Iterable of (filename, binary stream) pairs
+        user_id: ID of the user who owns the races
+        race_date: Optional date for every race; otherwise each race is
+                   dated by its first track point once processed
+        wait: Wait for parsing and analysis to finish before reporting
+    
+    Returns:
+        list: One dict per GPX file with 'filename' and 'status'
+              ('rejected', 'duplicate', 'queued', 'processed' or
+              'failed'), plus 'race_id' for queued, processed, failed and
+              duplicate files and 'error' for rejected and failed ones
+    """
+    max_file_size = current_app.config['MAX_GPX_FILE_SIZE']
+    max_batch_size = current_app.config['MAX_BATCH_UPLOAD_SIZE']
+    
+    report = []
+    stored_files = []
+    batch_size = 0
+    for filename, stream, error in expand_uploads(files, max_file_size):
+        entry = {'filename': filename}
+        report.append(entry)
+        if error:
+            entry.update(status='rejected', error=error)
+            continue
+        
+        if batch_size >= max_batch_size:
+            entry.update(status='rejected', error=f"Batch is larger than the {format_size(max_batch_size)} limit")
+            continue
+        
+        success, result = store_gpx_stream(stream, max_size=max_file_size)
+        if not success:
+            entry.update(status='rejected', error=result)
+            continue
+        batch_size += result['size']
+        if batch_size > max_batch_size:
+            discard_upload(result)
+            entry.update(status='rejected', error=f"Batch is larger than the {format_size(max_batch_size)} limit")
+            continue
+        stored_files.append((entry, result))
+    
+    # Re-uploads link to the user's existing races, found in one query
+    existing = Race.get_races_by_content(user_id, {result['sha256'] for _, result in stored_files})
+    saved = []
+    first_by_digest = {}
+    repeats = []
+    for entry, result in stored_files:
+        race = existing.get(result['sha256'])
+        if race is not None:
+            entry.update(status='duplicate', race_id=race.race_id)
+        elif result['sha256'] in first_by_digest:
+            repeats.append((entry, first_by_digest[result['sha256']]))
+        else:
+            first_by_digest[result['sha256']] = entry
+            saved.append((entry, result))
+    
+    # Until processing dates a race by its first point it carries the upload time
+    uploaded_at = datetime.utcnow()
+    races = Race.create_batch(user_id, [
+        {
+            'race_name': race_name_for(entry['filename']),
+            'race_date': race_date or uploaded_at,
+            'gpx_file_path': result['file_path'],
+            'gpx_sha256': result['sha256']
+        }
+        for entry, result in saved
+    ]) if saved else []
+    
+    # One pool job per file parses and analyzes it
+    jobs = []
+    for (entry, _), race in zip(saved, races):
+        entry.update(status='queued', race_id=race.race_id)
+        jobs.append((entry, race_queue.submit(race.race_id, date_from_track=race_date is None)))
+    
+    # Files repeated within the batch share the first copy's outcome
+    for entry, first in repeats:
+        entry.update(status='duplicate', race_id=first['race_id'])
+    
+    for entry, job in jobs:
+        if not (wait or job.done()):
+            continue
+        if job.exception() is not None:
+            entry.update(status='failed', error=f"Error processing race: {str(job.exception())}")
+        elif job.result():
+            entry['status'] = 'processed'
+        else:
+            entry['status'] = 'failed'
+            race = db.session.get(Race, entry['race_id'])
+            db.session.refresh(race)
+            entry['error'] = race.processing_error
+    
+    return report
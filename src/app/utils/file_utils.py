@@ -1,16 +1,27 @@
 import os
 import uuid
-from datetime import datetime
-from werkzeug.utils import secure_filename
-import gpxpy
+import hashlib
+from flask import current_app
+from app.utils.gpx_processor import GPXStreamParser, GPX_READ_CHUNK_SIZE
 
-def validate_gpx_file(file_storage):
+class FileTooLarge(Exception):
+    """Raised when an upload grows past the size limit while being copied"""
+    
+    def __init__(self, max_size):
+        super().__init__(f"File is larger than the {format_size(max_size)} limit")
+        self.max_size = max_size
+
+def format_size(size):
+    """Format a byte count for messages, e.g. '10 MB'"""
+    return f"{size / (1024 * 1024):g} MB"
+
+def _check_gpx_filename(file_storage):
     """
-    Validate that the uploaded file is a valid GPX file
+    Check that an upload is present and has a GPX extension
     
     Args:
         file_storage: FileStorage object from Flask
-        
+    
     Returns:
         tuple: (is_valid, error_message)
     """
@@ -22,65 +33,252 @@ def validate_gpx_file(file_storage):
     if not file_storage.filename.lower().endswith('.gpx'):
         return False, "File must be a GPX file"
     
-    # Try to parse the GPX data to validate its format
+    return True, ""
+
+def _check_gpx_content(parser):
+    """
+    Check that a fully fed GPX parser found track data
+    
+    Args:
+        parser: GPXStreamParser that has consumed the whole file
+    
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    # Check if there are any tracks
+    if not parser.track_count:
+        return False, "No track data found in GPX file"
+    
+    # Check if there are any points
+    if not parser.point_count:
+        return False, "No track points found in GPX file"
+    
+    return True, ""
+
+def validate_gpx_file(file_storage):
+    """
+    Validate that the uploaded file is a valid GPX file
+    
+    Args:
+        file_storage: FileStorage object from Flask
+    
+    Returns:
+        tuple: (is_valid, error_message)
+    """
+    is_valid, error_message = _check_gpx_filename(file_storage)
+    if not is_valid:
+        return False, error_message
+    
+    # Stream the GPX data to validate its format without building a full tree
     try:
-        content = file_storage.read()
-        file_storage.seek(0)  # Reset file pointer after reading
-        gpx = gpxpy.parse(content.decode('utf-8'))
-        
-        # Check if there are any tracks
-        if not gpx.tracks:
-            return False, "No track data found in GPX file"
-        
-        # Check if there are any points
-        has_points = False
-        for track in gpx.tracks:
-            for segment in track.segments:
-                if segment.points:
-                    has_points = True
-                    break
-            if has_points:
+        parser = GPXStreamParser()
+        stream = file_storage.stream
+        while True:
+            chunk = stream.read(GPX_READ_CHUNK_SIZE)
+            if not chunk:
                 break
+            parser.feed(chunk)
+        parser.close()
+        stream.seek(0)  # Reset file pointer after reading
         
-        if not has_points:
-            return False, "No track points found in GPX file"
-        
-        return True, ""
-        
+        return _check_gpx_content(parser)
+    
     except Exception as e:
         return False, f"Invalid GPX file: {str(e)}"
 
-def save_gpx_file(file_storage, user_id):
+def get_upload_root():
+    """Get the absolute path of the uploads directory"""
+    return os.path.abspath(os.path.join(os.path.dirname(__file__), '../../uploads'))
+
+def get_content_path(sha256):
+    """
+    Get where the GPX file with a given SHA-256 digest is stored
+    
+    Returns:
+        tuple: (file_path relative to the uploads directory, full_path)
+    """
+    file_path = os.path.join('content', sha256[:2], f'{sha256}.gpx')
+    return file_path, os.path.join(get_upload_root(), file_path)
+
+def store_gpx_stream(stream, max_size=None):
     """
-    Save an uploaded GPX file to a secure location with a unique filename
+    Save a GPX stream in the content-addressed upload store
+    
+    The stream is copied to a temporary file in chunks while its SHA-256
+    digest is computed, then moved to a path named after the digest. If
+    that file already exists, the same data was uploaded before and the
+    copy is dropped, so each distinct file is stored once however many
+    races use it. Bytes are counted as they are copied, so a stream that
+    turns out larger than max_size is rejected without filling the disk,
+    whatever size it claimed up front.
+    
+    Args:
+        stream: Binary file-like object to copy
+        max_size: Optional limit on the stream's size in bytes
+    
+    Returns:
+        tuple: (success, result or error_message) where result is a dict
+               with the relative 'file_path', the 'full_path', the
+               'sha256' hex digest, its 'size' in bytes and whether the
+               file was 'created'
+    """
+    temp_dir = os.path.join(get_upload_root(), 'content', 'tmp')
+    temp_path = os.path.join(temp_dir, f'{uuid.uuid4().hex}.gpx')
+    digest = hashlib.sha256()
+    size = 0
+    
+    try:
+        os.makedirs(temp_dir, exist_ok=True)
+        with open(temp_path, 'wb') as out_file:
+            while True:
+                chunk = stream.read(GPX_READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise FileTooLarge(max_size)
+                out_file.write(chunk)
+                digest.update(chunk)
+        
+        sha256 = digest.hexdigest()
+        file_path, full_path = get_content_path(sha256)
+        created = not os.path.exists(full_path)
+        if created:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            os.replace(temp_path, full_path)
+        else:
+            os.remove(temp_path)
+    except FileTooLarge as e:
+        _remove_partial_file(temp_path)
+        return False, str(e)
+    except OSError as e:
+        _remove_partial_file(temp_path)
+        return False, f"Error saving file: {str(e)}"
+    
+    return True, {
+        'file_path': file_path,
+        'full_path': full_path,
+        'sha256': sha256,
+        'size': size,
+        'created': created
+    }
+
+def ingest_gpx_file(file_storage, user_id):
+    """
+    Save and hash an uploaded GPX file, parsing it only if it is new
+    
+    The upload is streamed into the content-addressed store. If the user
+    already has a race made from identical data, that race is returned
+    without parsing anything; otherwise the stored file is read back,
+    validated and converted to columns.
     
     Args:
         file_storage: FileStorage object from Flask
         user_id: ID of the user who uploaded the file
-        
+    
     Returns:
-        tuple: (success, file_path or error_message)
+        tuple: (success, result or error_message) where result is a dict
+               with the relative 'file_path', the 'sha256' hex digest, the
+               existing 'race' for a re-upload (else None) and, for new
+               data, the parsed 'columns' (TrackColumns)
     """
-    # Validate the file
-    is_valid, error_message = validate_gpx_file(file_storage)
+    is_valid, error_message = _check_gpx_filename(file_storage)
     if not is_valid:
         return False, error_message
     
-    # Create upload directory if it doesn't exist
-    upload_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../uploads', str(user_id)))
-    os.makedirs(upload_dir, exist_ok=True)
+    success, stored = store_gpx_stream(file_storage.stream, current_app.config['MAX_GPX_FILE_SIZE'])
+    if not success:
+        return False, stored
     
-    # Generate a unique filename
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    original_filename = secure_filename(file_storage.filename)
-    filename_base, filename_ext = os.path.splitext(original_filename)
-    unique_filename = f"{filename_base}_{timestamp}_{str(uuid.uuid4())[:8]}{filename_ext}"
-    file_path = os.path.join(str(user_id), unique_filename)
-    full_path = os.path.join(upload_dir, unique_filename)
+    from app.models.race import Race
+    existing = Race.get_races_by_content(user_id, [stored['sha256']]).get(stored['sha256'])
+    if existing is not None:
+        return True, {'file_path': stored['file_path'], 'sha256': stored['sha256'], 'race': existing}
     
-    # Save the file
+    success, parsed = parse_gpx_path(stored['full_path'])
+    if not success:
+        discard_upload(stored)
+        return False, parsed
+    
+    return True, {
+        'file_path': stored['file_path'],
+        'sha256': stored['sha256'],
+        'race': None,
+        'columns': parsed
+    }
+
+def parse_gpx_path(full_path):
+    """
+    Parse and validate a saved GPX file into track columns
+    
+    Also runs in a worker process during batch uploads, so it takes a
+    path and returns only picklable values.
+    
+    Args:
+        full_path: Absolute path of the GPX file
+    
+    Returns:
+        tuple: (success, TrackColumns or error_message)
+    """
+    parser = GPXStreamParser()
+    points = []
     try:
-        file_storage.save(full_path)
-        return True, file_path
+        with open(full_path, 'rb') as gpx_file:
+            while True:
+                chunk = gpx_file.read(GPX_READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                points.extend(parser.feed(chunk))
+        points.extend(parser.close())
     except Exception as e:
-        return False, f"Error saving file: {str(e)}"
\ No newline at end of file
+        return False, f"Invalid GPX file: {str(e)}"
+    
+    return _points_to_track(parser, points)
+
+def _points_to_track(parser, points):
+    """
+    Validate a fully fed parser's output and convert it to track columns
+    
+    Returns:
+        tuple: (success, TrackColumns or error_message)
+    """
+    from app.utils.track_metrics import points_to_columns
+    
+    is_valid, error_message = _check_gpx_content(parser)
+    if not is_valid:
+        return False, error_message
+    
+    columns = points_to_columns(points)
+    if not len(columns.time):
+        return False, "No timestamped track points found in GPX file"
+    return True, columns
+
+def discard_upload(stored):
+    """Remove a rejected upload, unless the same data was already stored for another race"""
+    if stored['created']:
+        _remove_partial_file(stored['full_path'])
+
+def _remove_partial_file(full_path):
+    """Remove a file left behind by a failed upload"""
+    try:
+        if os.path.exists(full_path):
+            os.remove(full_path)
+    except OSError:
+        pass
+
+def save_gpx_file(file_storage, user_id):
+    """
+    Save an uploaded GPX file to the content-addressed upload store
+    
+    Args:
+        file_storage: FileStorage object from Flask
+        user_id: ID of the user who uploaded the file
+    
+    Returns:
+        tuple: (success, file_path or error_message)
+    """
+    success, result = ingest_gpx_file(file_storage, user_id)
+    if not success:
+        return False, result
+    
+    return True, result['file_path']
\ No newline at end of file
@@ -0,0 +1,170 @@
+import numpy as np
+from app import db
+from app.models.race import Race
+from app.models.track_point import TrackPoint
+from app.models.race_track import epoch_ms_to_datetime
+from app.utils.race_cache import RaceCache
+from app.utils.track_metrics import haversine_array, METERS_PER_NM
+
+# Point columns resampled onto the fleet grid
+FLEET_COLUMNS = ('latitude', 'longitude', 'speed', 'vmg')
+
+# Aligned fleets by (race IDs, (race versions, step)); any race changing
+# gives a new key, and old alignments age out of the LRU
+_alignment_cache = RaceCache(max_size=8)
+
+
+def _interp(grid, times, values, inside):
+    """Interpolate one boat's column onto the grid, NaN outside its track"""
+    known = ~np.isnan(values)
+    if not known.any():
+        return np.full(len(grid), np.nan)
+    return np.where(inside, np.interp(grid, times[known], values[known]), np.nan)
+
+
+class FleetAlignment:
+    """
+    Several boats' tracks resampled onto one shared time grid
+    
+    Every series is a (boats, times) matrix, so fleet-wide comparisons are
+    single array operations, and scrubbing to a time is an index lookup.
+    Each boat is NaN outside its own track.
+    
+    Progress is course distance made good, the running integral of |VMG|.
+    Upwind and downwind legs both count forward, so the leader on a
+    windward-leeward course is the boat with the most progress whatever
+    leg it is on. Without VMG for every boat (races with no wind),
+    distance sailed is used instead.
+    """
+    
+    def __init__(self, race_ids, grid, series, progress_basis):
+        self.race_ids = list(race_ids)
+        self.grid = grid            # Epoch milliseconds
+        self.progress_basis = progress_basis
+        self.latitude = series['latitude']
+        self.longitude = series['longitude']
+        self.speed = series['speed']
+        self.vmg = series['vmg']
+        
+        boats, steps = self.latitude.shape
+        step_hours = np.diff(grid, prepend=grid[0]) / 3600000.0
+        rate = np.abs(self.vmg) if progress_basis == 'vmg' else self.speed
+        self.progress = np.cumsum(np.nan_to_num(rate) * step_hours, axis=1)  # Nautical miles
+        
+        # Leader per time step and every boat's deficit to it
+        self.leader = np.argmax(self.progress, axis=0)
+        columns = np.arange(steps)
+        self.gap = self.progress[self.leader, columns] - self.progress
+        self.separation = haversine_array(
+            self.latitude, self.longitude,
+            self.latitude[self.leader, columns], self.longitude[self.leader, columns]
+        ) / METERS_PER_NM
+        
+        # VMG against the fleet average at each time
+        known = ~np.isnan(self.vmg)
+        counts = known.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            fleet_vmg = np.where(counts > 0, np.nansum(self.vmg, axis=0) / counts, np.nan)
+        self.vmg_delta = self.vmg - fleet_vmg
+    
+    @classmethod
+    def for_races(cls, race_ids, step=1.0, max_points=20000):
+        """
+        Get the (cached) alignment of a set of races
+        
+        Args:
+            race_ids: IDs of the races to compare
+            step: Grid spacing in seconds
+            max_points: Cap on grid length; the step widens to fit
+        
+        Returns:
+            FleetAlignment: Alignment of the races' current tracks
+        """
+        race_ids = sorted(set(race_ids))
+        versions = dict(db.session.query(Race.race_id, Race.track_updated_at).filter(Race.race_id.in_(race_ids)).all())
+        version_key = (tuple(versions.get(race_id) for race_id in race_ids), step, max_points)
+        
+        return _alignment_cache.get(
+            tuple(race_ids), version_key,
+            lambda: cls.build(race_ids, step, max_points)
+        )
+    
+    @classmethod
+    def build(cls, race_ids, step=1.0, max_points=20000):
+        """Resample the races' stored tracks onto a shared grid"""
+        tracks = [TrackPoint.get_point_page(race_id, ('timestamp',) + FLEET_COLUMNS) for race_id in race_ids]
+        tracks = [(race_id, track) for race_id, track in zip(race_ids, tracks) if len(track['timestamp'])]
+        if not tracks:
+            raise ValueError("None of the races have track points")
+        
+        start = min(float(track['timestamp'][0]) for _, track in tracks)
+        end = max(float(track['timestamp'][-1]) for _, track in tracks)
+        step_ms = max(step * 1000.0, (end - start) / max(max_points - 1, 1))
+        grid = np.arange(start, end + step_ms / 2, step_ms)
+        
+        series = {name: np.empty((len(tracks), len(grid))) for name in FLEET_COLUMNS}
+        for row, (_, track) in enumerate(tracks):
+            times = track['timestamp'].astype(np.float64)
+            inside = (grid >= times[0]) & (grid <= times[-1])
+            for name in FLEET_COLUMNS:
+                series[name][row] = _interp(grid, times, track[name].astype(np.float64), inside)
+        
+        # VMG only ranks boats fairly if every boat has it
+        has_vmg = all(not np.isnan(track['vmg']).all() for _, track in tracks)
+        return cls([race_id for race_id, _ in tracks], grid, series, 'vmg' if has_vmg else 'distance')
+    
+    def index_at(self, time_ms):
+        """Get the grid position nearest to a time (epoch milliseconds)"""
+        if len(self.grid) < 2:
+            return 0
+        step_ms = self.grid[1] - self.grid[0]
+        return int(np.clip(round((time_ms - self.grid[0]) / step_ms), 0, len(self.grid) - 1))
+    
+    def snapshot(self, time_ms):
+        """
+        Get every boat's state at one time
+        
+        Returns:
+            dict: Grid time, leader race ID and per-boat values
+        """
+        index = self.index_at(time_ms)
+        return {
+            'time': epoch_ms_to_datetime(int(self.grid[index])).isoformat(),
+            'leader': self.race_ids[int(self.leader[index])],
+            'progress_basis': self.progress_basis,
+            'boats': [
+                {
+                    'race_id': race_id,
+                    **{name: _json_value(getattr(self, name)[row, index]) for name in _SERIES}
+                }
+                for row, race_id in enumerate(self.race_ids)
+            ]
+        }
+    
+    def to_dict(self):
+        """
+        Get the whole alignment for the API
+        
+        Times are epoch milliseconds; each series has one list per boat in
+        race_ids order, with null where a boat has no track.
+        """
+        return {
+            'race_ids': self.race_ids,
+            'times': self.grid.astype(np.int64).tolist(),
+            'progress_basis': self.progress_basis,
+            'leader': [self.race_ids[row] for row in self.leader.tolist()],
+            'series': {
+                name: [[_json_value(value) for value in row] for row in getattr(self, name).tolist()]
+                for name in _SERIES
+            }
+        }
+
+
+# Matrices reported per boat
+_SERIES = ('latitude', 'longitude', 'speed', 'vmg', 'progress', 'gap', 'separation', 'vmg_delta')
+
+
+def _json_value(value):
+    """Convert a float for JSON, with NaN as None"""
+    value = float(value)
+    return None if value != value else value
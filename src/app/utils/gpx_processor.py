@@ -1,8 +1,131 @@
-import json
-import math
-import gpxpy
-import gpxpy.gpx
-from datetime import datetime
+from datetime import datetime, timezone
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from gpxpy.gpxfield import parse_time
+from app.utils.track_metrics import points_to_columns, compute_track_metrics
+from app.utils.track_filter import filter_track
+from app.utils.point_codec import encode_points
+
+# Size of the chunks read from GPX files while streaming
+GPX_READ_CHUNK_SIZE = 64 * 1024
+
+# A single track point as read from a GPX file
+GPXPoint = namedtuple('GPXPoint', ['lat', 'lon', 'ele', 'time'])
+
+
+def _local_name(tag):
+    """Strip the XML namespace from an element tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+class GPXStreamParser:
+    """
+    Incremental GPX parser that turns raw bytes into track point records
+
+    Bytes are pushed in with feed() as they arrive and the completed <trkpt>
+    elements are returned straight away. Every finished element is detached
+    from the partial tree, so memory stays constant whatever the file size.
+    """
+    
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._stack = []
+        self._point_depth = 0
+        self.track_count = 0
+        self.point_count = 0
+    
+    def feed(self, data):
+        """
+        Feed a chunk of GPX data to the parser
+        
+        Args:
+            data: Bytes read from the GPX file
+            
+        Returns:
+            list: GPXPoint records completed by this chunk
+        """
+        self._parser.feed(data)
+        return self._read_points()
+    
+    def close(self):
+        """
+        Signal the end of the GPX data
+        
+        Returns:
+            list: Any GPXPoint records still pending in the parser
+        """
+        self._parser.close()
+        return self._read_points()
+    
+    def _read_points(self):
+        """Collect the points completed by the events parsed so far"""
+        points = []
+        for event, elem in self._parser.read_events():
+            name = _local_name(elem.tag)
+            
+            if event == 'start':
+                self._stack.append(elem)
+                if name == 'trkpt':
+                    self._point_depth += 1
+                elif name == 'trk' and not self._point_depth:
+                    self.track_count += 1
+                continue
+            
+            self._stack.pop()
+            if name == 'trkpt':
+                self._point_depth -= 1
+                points.append(self._read_point(elem))
+                self.point_count += 1
+            elif self._point_depth:
+                # Children of a track point are read when the point closes
+                continue
+            
+            # Detach the finished element so the tree never grows
+            elem.clear()
+            if self._stack:
+                self._stack[-1].remove(elem)
+        
+        return points
+    
+    @staticmethod
+    def _read_point(elem):
+        """Build a GPXPoint from a <trkpt> element"""
+        ele = None
+        time = None
+        for child in elem:
+            name = _local_name(child.tag)
+            if name == 'ele' and child.text:
+                ele = float(child.text)
+            elif name == 'time' and child.text:
+                time = parse_time(child.text.strip())
+        
+        return GPXPoint(
+            float(elem.get('lat')),
+            float(elem.get('lon')),
+            ele,
+            time
+        )
+
+
+def iter_gpx_points(gpx_file, chunk_size=GPX_READ_CHUNK_SIZE):
+    """
+    Stream the track points of a GPX file one at a time
+    
+    Args:
+        gpx_file: Binary file-like object containing GPX data
+        chunk_size: Number of bytes to read per chunk
+        
+    Yields:
+        GPXPoint: (lat, lon, ele, time) for each track point, in file order
+    """
+    parser = GPXStreamParser()
+    while True:
+        chunk = gpx_file.read(chunk_size)
+        if not chunk:
+            break
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
 
 def process_gpx_file(gpx_file, user_id, session_name):
     """
@@ -16,106 +139,48 @@ def process_gpx_file(gpx_file, user_id, session_name):
     Returns:
         dict: Processed sailing data including points, stats, etc.
     """
-    # Read GPX file content
-    gpx_content = gpx_file.read().decode('utf-8')
-    gpx_file.close()
-    
-    # Parse GPX data
-    gpx = gpxpy.parse(gpx_content)
-    
-    # Initialize variables for calculations
-    points = []
-    speeds = []
-    total_distance = 0
-    prev_point = None
-    
-    # Get the track's start time
-    start_time = None
-    if gpx.tracks and gpx.tracks[0].segments and gpx.tracks[0].segments[0].points:
-        start_time = gpx.tracks[0].segments[0].points[0].time
-    
-    # Process all track points
-    for track in gpx.tracks:
-        for segment in track.segments:
-            for point in segment.points:
-                # Skip points without timestamp
-                if not point.time:
-                    continue
-                
-                # Calculate speed between points
-                speed = 0
-                if prev_point:
-                    # Calculate distance in meters
-                    distance = haversine(
-                        prev_point.latitude, prev_point.longitude,
-                        point.latitude, point.longitude
-                    )
-                    
-                    # Calculate time difference in seconds
-                    time_diff = (point.time - prev_point.time).total_seconds()
-                    
-                    if time_diff > 0:
-                        # Speed in m/s, convert to knots (1 m/s = 1.94384 knots)
-                        speed = (distance / time_diff) * 1.94384
-                        total_distance += distance
-                        speeds.append(speed)
-                
-                # Create point data for JSON storage
-                point_data = {
-                    'lat': point.latitude,
-                    'lon': point.longitude,
-                    'ele': point.elevation,
-                    'time': point.time.isoformat(),
-                    'speed': speed
-                }
-                points.append(point_data)
-                prev_point = point
+    try:
+        return process_gpx_points(iter_gpx_points(gpx_file))
+    finally:
+        gpx_file.close()
+
+
+def process_gpx_points(gpx_points):
+    """
+    Extract sailing data from already parsed GPX track points
     
-    # Calculate session statistics
-    end_time = points[-1]['time'] if points else None
-    duration = 0
+    Lets callers that already parsed the file (see
+    parse_gpx_path) get the statistics without reading it again.
     
-    if start_time and end_time:
-        start_time_dt = start_time
-        end_time_dt = datetime.fromisoformat(end_time)
-        duration = (end_time_dt - start_time_dt).total_seconds()
+    Args:
+        gpx_points: Iterable of GPXPoint records in track order
+        
+    Returns:
+        dict: Processed sailing data including points, stats, etc.
+    """
+    # Skip points without timestamp
+    timed_points = [point for point in gpx_points if point.time]
     
-    # Convert total_distance from meters to kilometers
-    total_distance = total_distance / 1000
+    # Calculate speed, distance and totals for the whole track at once,
+    # after GPS glitches and jitter are filtered out
+    columns = filter_track(points_to_columns(timed_points))
+    metrics = compute_track_metrics(columns.lat, columns.lon, columns.time)
     
-    # Calculate max and average speed
-    max_speed = max(speeds) if speeds else 0
-    avg_speed = sum(speeds) / len(speeds) if speeds else 0
+    # The first fix can be filtered out as a glitch, so date the race by
+    # the first one kept
+    start_time = datetime.fromtimestamp(columns.time[0], timezone.utc) if len(columns.time) else None
     
     # Prepare result data
     result = {
         'date': start_time,
-        'duration': duration,
-        'distance': total_distance,
-        'max_speed': max_speed,
-        'avg_speed': avg_speed,
-        'points_json': json.dumps(points)
+        'duration': metrics['duration'],
+        'distance': metrics['total_distance'],
+        'max_speed': metrics['max_speed'],
+        'avg_speed': metrics['avg_speed'],
+        'points_data': encode_points(
+            columns.lat, columns.lon, columns.time, metrics['speed'], columns.ele
+        )
     }
     
     return result
 
-
-def haversine(lat1, lon1, lat2, lon2):
-    """
-    Calculate the great circle distance between two points 
-    on the earth (specified in decimal degrees)
-    
-    Returns:
-        float: Distance in meters
-    """
-    # Convert decimal degrees to radians
-    lon1, lat1, lon2, lat2 = map(math.radians, [lon1, lat1, lon2, lat2])
-    
-    # Haversine formula
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    r = 6371000  # Radius of earth in meters
-    
-    return c * r
\ No newline at end of file
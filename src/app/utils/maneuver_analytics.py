@@ -0,0 +1,132 @@
+import numpy as np
+from app import db
+from app.models.race import Race
+from app.models.maneuver import Maneuver, ManeuverType
+from app.models.maneuver_summary import (
+    ManeuverSummary, WIND_BANDS, UNKNOWN_WIND_BAND, HISTOGRAM_BINS
+)
+
+# Order wind bands are reported in
+WIND_BAND_NAMES = [name for name, _, _ in WIND_BANDS] + [UNKNOWN_WIND_BAND]
+
+
+def _empty_totals():
+    """Get zeroed running totals for one group of summary rows"""
+    totals = {'count': 0}
+    for name, edges in HISTOGRAM_BINS.items():
+        totals[f'{name}_sum'] = 0.0
+        totals[f'{name}_histogram'] = np.zeros(len(edges) - 1, dtype=np.int64)
+    return totals
+
+
+def _add_summary(totals, summary):
+    """Add one ManeuverSummary row to running totals"""
+    totals['count'] += summary.maneuver_count
+    for name in HISTOGRAM_BINS:
+        totals[f'{name}_sum'] += getattr(summary, f'{name}_sum')
+        totals[f'{name}_histogram'] += np.asarray(getattr(summary, f'{name}_histogram'), dtype=np.int64)
+
+
+def _finish_totals(totals):
+    """Turn running totals into averages and labelled distributions"""
+    result = {'count': totals['count']}
+    for name, edges in HISTOGRAM_BINS.items():
+        counts = totals[f'{name}_histogram']
+        measured = int(counts.sum())
+        result[f'avg_{name}'] = totals[f'{name}_sum'] / measured if measured else None
+        result[f'{name}_distribution'] = {
+            'bin_edges': edges.tolist(),
+            'counts': counts.tolist()
+        }
+    return result
+
+
+def get_user_maneuver_analytics(user_id, maneuver_type=None):
+    """
+    Aggregate a user's maneuvers across all their races
+    
+    Built from the pre-aggregated maneuver_summaries rows, a few per race,
+    so a season or years of racing add up in milliseconds. Distribution
+    counts use the fixed HISTOGRAM_BINS edges; the first and last bins
+    also hold values below and above the edges.
+    
+    Args:
+        user_id: ID of the user
+        maneuver_type: Optional ManeuverType to restrict to
+    
+    Returns:
+        dict: By maneuver type value, the stats over 'all' maneuvers and
+              'by_wind_band', with count, avg_duration, avg_speed_loss,
+              avg_efficiency and a distribution of each metric
+    """
+    summaries = ManeuverSummary.get_for_user(user_id)
+    
+    totals = {}
+    for summary in summaries:
+        if maneuver_type is not None and summary.maneuver_type is not maneuver_type:
+            continue
+        by_type = totals.setdefault(summary.maneuver_type.value, {'all': _empty_totals(), 'by_wind_band': {}})
+        _add_summary(by_type['all'], summary)
+        _add_summary(by_type['by_wind_band'].setdefault(summary.wind_band, _empty_totals()), summary)
+    
+    return {
+        type_value: {
+            'all': _finish_totals(by_type['all']),
+            'by_wind_band': {
+                band: _finish_totals(by_type['by_wind_band'][band])
+                for band in WIND_BAND_NAMES if band in by_type['by_wind_band']
+            }
+        }
+        for type_value, by_type in totals.items()
+    }
+
+
+def get_ranked_maneuvers(user_id, maneuver_type, best=True, limit=10, wind_band=None):
+    """
+    Rank a user's maneuvers of one type across all their races by efficiency
+    
+    The (race_id, maneuver_type, efficiency) index finds each race's
+    matching maneuvers, but the ranking spans races, so the database still
+    sorts them (a top-N sort, since only limit rows are kept).
+    
+    Args:
+        user_id: ID of the user
+        maneuver_type: ManeuverType to rank
+        best: Most efficient first if True, least efficient first otherwise
+        limit: Number of maneuvers to return
+        wind_band: Optional wind band name to restrict to
+    
+    Returns:
+        list: Maneuvers, each with its race
+    """
+    query = db.session.query(Maneuver, Race.race_name).join(
+        Race, Race.race_id == Maneuver.race_id
+    ).filter(
+        Race.user_id == user_id,
+        Maneuver.maneuver_type == maneuver_type,
+        Maneuver.efficiency.isnot(None)
+    )
+    
+    if wind_band == UNKNOWN_WIND_BAND:
+        query = query.filter(Maneuver.wind_speed.is_(None))
+    elif wind_band is not None:
+        lower, upper = next((lower, upper) for name, lower, upper in WIND_BANDS if name == wind_band)
+        query = query.filter(Maneuver.wind_speed >= lower)
+        if upper is not None:
+            query = query.filter(Maneuver.wind_speed < upper)
+    
+    order = Maneuver.efficiency.desc() if best else Maneuver.efficiency
+    return query.order_by(order).limit(limit).all()
+
+
+def parse_maneuver_type(value):
+    """
+    Parse a maneuver type query parameter
+    
+    Raises:
+        ValueError: If the value is not a maneuver type
+    """
+    try:
+        return ManeuverType(value)
+    except ValueError:
+        raise ValueError(f"Unknown maneuver type: {value}") from None
@@ -0,0 +1,373 @@
+from datetime import datetime
+import numpy as np
+from app import db
+from app.models.maneuver import Maneuver, ManeuverType
+from app.models.maneuver_summary import ManeuverSummary
+from app.models.race_track import epoch_ms_to_datetime
+from app.utils.track_metrics import compute_wind_metrics, MS_TO_KNOTS
+from app.utils.track_simplify import project_local
+
+# Detection parameters (seconds, degrees, knots)
+TURN_WINDOW = 10.0        # Heading change is measured across this window
+MIN_HEADING_CHANGE = 50.0 # Minimum turn across the window to count as turning
+MIN_SPEED = 1.0           # Ignore turns made while drifting
+MIN_GAP = 20.0            # Turns closer together than this are one maneuver
+STEADY_WINDOW = 10.0      # Entry/exit conditions are averaged over this long
+SETTLED_FRACTION = 0.1    # A maneuver starts/ends within this share of its turn
+MANEUVER_REACH = 120.0    # Track either side of a maneuver's center its detection reads
+
+
+def wrap_angle(angles):
+    """Wrap angles in degrees to [-180, 180)"""
+    return (np.asarray(angles) + 180) % 360 - 180
+
+
+def window_means(values, starts, ends):
+    """
+    Get the mean of values[start:end] for many windows at once
+    
+    Args:
+        values: Array of values (NaN is skipped)
+        starts: Array of window start positions
+        ends: Array of window end positions (exclusive)
+    
+    Returns:
+        ndarray: Mean per window, NaN for empty windows
+    """
+    known = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(known, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(known)))
+    count = counts[ends] - counts[starts]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(count > 0, (sums[ends] - sums[starts]) / count, np.nan)
+
+
+def estimate_wind_direction(speed, heading, turn_directions):
+    """
+    Estimate a constant wind direction from a track with no wind data
+    
+    A boat tacks and gybes through the wind, so the mid-turn headings of
+    its big turns all lie along the wind axis; their doubled-angle circular
+    mean gives that axis. The end of the axis the boat sails towards more
+    slowly is taken as upwind.
+    
+    Args:
+        speed: Array of speeds in knots
+        heading: Array of headings in degrees
+        turn_directions: Heading halfway through each big turn, in degrees
+    
+    Returns:
+        float: Estimated direction the wind blows from, or None
+    """
+    if not len(turn_directions):
+        return None
+    
+    doubled = np.radians(np.asarray(turn_directions) * 2)
+    axis = np.degrees(np.arctan2(np.sin(doubled).mean(), np.cos(doubled).mean())) / 2
+    
+    moving = speed >= MIN_SPEED
+    candidates = np.array([axis, axis + 180]) % 360
+    speeds = []
+    for candidate in candidates:
+        towards = moving & (np.abs(wrap_angle(heading - candidate)) < 60)
+        speeds.append(speed[towards].mean() if towards.any() else np.inf)
+    return float(candidates[int(np.argmin(speeds))])
+
+
+def find_turns(times, speed, heading):
+    """
+    Find the big turns in a track
+    
+    Turning is found with a rolling window over the unwrapped heading:
+    wherever the heading changes by MIN_HEADING_CHANGE or more across
+    TURN_WINDOW seconds while moving. Runs of turning points closer than
+    MIN_GAP merge into one turn.
+    
+    Args:
+        times: Array of timestamps in epoch seconds
+        speed: Array of speeds in knots
+        heading: Array of headings in degrees
+    
+    Returns:
+        dict: Per-turn arrays ('span_start', 'span_end', 'entry_start',
+              'exit_end', 'entry', 'exit', 'change') plus the track's
+              'unwrapped' heading; None when there are no turns
+    """
+    if len(times) < 3:
+        return None
+    
+    unwrapped = np.degrees(np.unwrap(np.radians(heading)))
+    half = TURN_WINDOW / 2
+    window_start = np.searchsorted(times, times - half, side='left')
+    window_end = np.searchsorted(times, times + half, side='right') - 1
+    
+    turn = unwrapped[window_end] - unwrapped[window_start]
+    rolling_speed = window_means(speed, window_start, window_end + 1)
+    turning = (np.abs(turn) >= MIN_HEADING_CHANGE) & (rolling_speed >= MIN_SPEED)
+    if not turning.any():
+        return None
+    
+    # Runs of turning points, merged across short gaps
+    edges = np.diff(turning.astype(np.int8), prepend=0, append=0)
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1) - 1
+    separate = times[run_starts[1:]] - times[run_ends[:-1]] >= MIN_GAP
+    run_starts = run_starts[np.concatenate(([True], separate))]
+    run_ends = run_ends[np.concatenate((separate, [True]))]
+    
+    # Search span around each run, and the steady windows either side
+    span_starts = np.searchsorted(times, times[run_starts] - half, side='left')
+    span_ends = np.searchsorted(times, times[run_ends] + half, side='right') - 1
+    entry_starts = np.searchsorted(times, times[span_starts] - STEADY_WINDOW, side='left')
+    exit_ends = np.searchsorted(times, times[span_ends] + STEADY_WINDOW, side='right')
+    
+    entry_heading = window_means(unwrapped, entry_starts, np.maximum(span_starts, entry_starts + 1))
+    exit_heading = window_means(unwrapped, np.minimum(span_ends + 1, exit_ends - 1), exit_ends)
+    
+    return {
+        'unwrapped': unwrapped,
+        'span_start': span_starts,
+        'span_end': span_ends,
+        'entry_start': entry_starts,
+        'exit_end': exit_ends,
+        'entry': entry_heading,
+        'exit': exit_heading,
+        'change': exit_heading - entry_heading
+    }
+
+
+def estimate_track_wind(times, speed, heading):
+    """Estimate a constant wind direction from a track's turns, or None"""
+    speed = np.nan_to_num(np.asarray(speed, dtype=np.float64))
+    heading = np.nan_to_num(np.asarray(heading, dtype=np.float64))
+    turns = find_turns(np.asarray(times, dtype=np.float64), speed, heading)
+    if turns is None:
+        return None
+    
+    big = np.abs(turns['change']) >= MIN_HEADING_CHANGE
+    return estimate_wind_direction(
+        speed, heading, (turns['entry'] + turns['change'] / 2)[big] % 360
+    )
+
+
+def detect_maneuvers(times, lat, lon, speed, heading, wind_direction):
+    """
+    Find tacks and gybes in a track
+    
+    Big turns come from find_turns. A turn whose entry and exit headings
+    are on opposite tacks close-hauled is a tack; on opposite gybes
+    running it is a gybe; other turns are ignored.
+    
+    Args:
+        times: Array of timestamps in epoch seconds
+        lat: Array of latitudes in degrees
+        lon: Array of longitudes in degrees
+        speed: Array of speeds in knots
+        heading: Array of headings in degrees
+        wind_direction: Wind direction per point in degrees
+    
+    Returns:
+        list: Dicts with the maneuver type, 'start', 'center' and 'end'
+              positions in the arrays and every Maneuver metric
+    """
+    times = np.asarray(times, dtype=np.float64)
+    speed = np.nan_to_num(np.asarray(speed, dtype=np.float64))
+    heading = np.nan_to_num(np.asarray(heading, dtype=np.float64))
+    
+    turns = find_turns(times, speed, heading)
+    if turns is None:
+        return []
+    
+    unwrapped = turns['unwrapped']
+    span_starts, span_ends = turns['span_start'], turns['span_end']
+    entry_starts, exit_ends = turns['entry_start'], turns['exit_end']
+    entry_unwrapped, exit_unwrapped = turns['entry'], turns['exit']
+    change = turns['change']
+    
+    wind = np.asarray(wind_direction, dtype=np.float64)
+    x, y = project_local(lat, lon)
+    
+    maneuvers = []
+    for index in range(len(change)):
+        if not abs(change[index]) >= MIN_HEADING_CHANGE:
+            continue
+        
+        # Tighten the span to where the heading leaves the entry course
+        # and settles on the exit course
+        span = unwrapped[span_starts[index]:span_ends[index] + 1]
+        tolerance = SETTLED_FRACTION * abs(change[index])
+        left = np.flatnonzero(np.abs(span - entry_unwrapped[index]) > tolerance)
+        right = np.flatnonzero(np.abs(span - exit_unwrapped[index]) > tolerance)
+        if not len(left) or not len(right):
+            continue
+        start = span_starts[index] + max(left[0] - 1, 0)
+        end = span_starts[index] + min(right[-1] + 1, len(span) - 1)
+        if end <= start:
+            continue
+        
+        # The center is where the heading is halfway through the turn
+        halfway = entry_unwrapped[index] + change[index] / 2
+        crossed = np.flatnonzero((unwrapped[start:end + 1] - halfway) * np.sign(change[index]) >= 0)
+        center = start + (crossed[0] if len(crossed) else (end - start) // 2)
+        
+        entry_heading = entry_unwrapped[index] % 360
+        exit_heading = exit_unwrapped[index] % 360
+        entry_angle = wrap_angle(entry_heading - wind[center])
+        exit_angle = wrap_angle(exit_heading - wind[center])
+        if np.sign(entry_angle) == np.sign(exit_angle):
+            continue
+        if abs(entry_angle) < 90 and abs(exit_angle) < 90:
+            maneuver_type = ManeuverType.TACK
+        elif abs(entry_angle) > 90 and abs(exit_angle) > 90:
+            maneuver_type = ManeuverType.GYBE
+        else:
+            continue
+        
+        maneuvers.append({
+            'maneuver_type': maneuver_type,
+            'start': int(start),
+            'center': int(center),
+            'end': int(end),
+            'entry': (int(entry_starts[index]), int(max(start, entry_starts[index] + 1))),
+            'exit': (int(min(end + 1, exit_ends[index] - 1)), int(exit_ends[index])),
+            'entry_heading': float(entry_heading),
+            'exit_heading': float(exit_heading),
+            'heading_change': float(abs(change[index]))
+        })
+    
+    if not maneuvers:
+        return []
+    
+    # Speed, VMG and efficiency for every maneuver at once
+    _, vmg = compute_wind_metrics(speed, heading, wind)
+    starts = np.array([m['start'] for m in maneuvers])
+    ends = np.array([m['end'] for m in maneuvers])
+    speed_before = window_means(speed, *np.array([m['entry'] for m in maneuvers]).T)
+    speed_after = window_means(speed, *np.array([m['exit'] for m in maneuvers]).T)
+    vmg_before = window_means(vmg, *np.array([m['entry'] for m in maneuvers]).T)
+    vmg_after = window_means(vmg, *np.array([m['exit'] for m in maneuvers]).T)
+    min_speed = np.array([speed[start:end + 1].min() for start, end in zip(starts, ends)])
+    duration = times[ends] - times[starts]
+    
+    # Distance made good towards (tacks) or away from (gybes) the wind
+    # while maneuvering, against what the entry VMG would have made
+    wind_radians = np.radians(wind[[m['center'] for m in maneuvers]])
+    made_good = (
+        (x[ends] - x[starts]) * np.sin(wind_radians) +
+        (y[ends] - y[starts]) * np.cos(wind_radians)
+    )
+    upwind = np.array([m['maneuver_type'] == ManeuverType.TACK for m in maneuvers])
+    made_good = np.where(upwind, made_good, -made_good)
+    expected = np.abs(vmg_before) / MS_TO_KNOTS * duration
+    with np.errstate(invalid='ignore', divide='ignore'):
+        efficiency = np.where(expected > 0, np.clip(100 * made_good / expected, 0, 100), np.nan)
+    
+    for index, maneuver in enumerate(maneuvers):
+        del maneuver['entry'], maneuver['exit']
+        maneuver.update({
+            'speed_before': speed_before[index],
+            'speed_after': speed_after[index],
+            'speed_loss': speed_before[index] - min_speed[index],
+            'duration': duration[index],
+            'vmg_before': vmg_before[index],
+            'vmg_after': vmg_after[index],
+            'efficiency': efficiency[index]
+        })
+        for name in ('speed_before', 'speed_after', 'speed_loss', 'duration',
+                     'vmg_before', 'vmg_after', 'efficiency'):
+            value = float(maneuver[name])
+            maneuver[name] = None if value != value else value
+    
+    return maneuvers
+
+
+def detect_race_maneuvers(race, columns, wind, wind_speed=None, window=None):
+    """
+    Detect a race's tacks and gybes and replace its stored maneuvers
+    
+    With a window only the maneuvers centered inside it are replaced;
+    columns must then cover at least MANEUVER_REACH either side of it so
+    those maneuvers are detected exactly as a whole-track pass would.
+    The race's maneuver summary rows are rebuilt to match. The caller
+    commits.
+    
+    Args:
+        race: Race to analyze
+        columns: Track arrays from race_analysis.load_analysis_columns
+        wind: Wind direction per point in degrees, or None if unknown
+        wind_speed: Optional wind speed per point in knots (NaN if unknown)
+        window: Optional (start, end) epoch milliseconds, both inclusive;
+                None for unbounded
+    
+    Returns:
+        int: Number of maneuvers stored
+    """
+    query = Maneuver.query.filter_by(race_id=race.race_id)
+    if window is not None:
+        start, end = window
+        if start is not None:
+            query = query.filter(Maneuver.timestamp >= epoch_ms_to_datetime(start))
+        if end is not None:
+            query = query.filter(Maneuver.timestamp <= epoch_ms_to_datetime(end))
+    query.delete(synchronize_session=False)
+    count = _store_maneuvers(race, columns, wind, wind_speed, window) if wind is not None else 0
+    ManeuverSummary.rebuild_race(race.race_id, race.user_id)
+    return count
+
+
+def _store_maneuvers(race, columns, wind, wind_speed, window=None):
+    """Detect and bulk insert a race's maneuvers, returning how many"""
+    times = columns['time']
+    maneuvers = detect_maneuvers(
+        times, columns['latitude'], columns['longitude'],
+        columns['speed'], columns['heading'], wind
+    )
+    if window is not None:
+        start, end = window
+        maneuvers = [
+            maneuver for maneuver in maneuvers
+            if (start is None or round(times[maneuver['center']] * 1000) >= start)
+            and (end is None or round(times[maneuver['center']] * 1000) <= end)
+        ]
+    if not maneuvers:
+        return 0
+    
+    point_ids = columns['point_id']
+    created_at = datetime.utcnow()
+    rows = []
+    for maneuver in maneuvers:
+        center = maneuver['center']
+        rows.append({
+            'race_id': race.race_id,
+            'maneuver_type': maneuver['maneuver_type'],
+            'timestamp': epoch_ms_to_datetime(round(times[center] * 1000)),
+            'latitude': float(columns['latitude'][center]),
+            'longitude': float(columns['longitude'][center]),
+            'speed_before': maneuver['speed_before'],
+            'speed_after': maneuver['speed_after'],
+            'speed_loss': maneuver['speed_loss'],
+            'duration': maneuver['duration'],
+            'entry_heading': maneuver['entry_heading'],
+            'exit_heading': maneuver['exit_heading'],
+            'heading_change': maneuver['heading_change'],
+            'vmg_before': maneuver['vmg_before'],
+            'vmg_after': maneuver['vmg_after'],
+            'efficiency': maneuver['efficiency'],
+            'wind_speed': _wind_speed_at(wind_speed, center),
+            'start_point_id': int(point_ids[maneuver['start']]) if point_ids is not None else None,
+            'center_point_id': int(point_ids[center]) if point_ids is not None else None,
+            'end_point_id': int(point_ids[maneuver['end']]) if point_ids is not None else None,
+            'created_at': created_at
+        })
+    
+    # One executemany for the whole race
+    db.session.execute(Maneuver.__table__.insert(), rows)
+    return len(rows)
+
+
+def _wind_speed_at(wind_speed, position):
+    """Get the wind speed at a point as a float, or None if unknown"""
+    if wind_speed is None:
+        return None
+    value = float(wind_speed[position])
+    return None if value != value else value
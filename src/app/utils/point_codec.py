@@ -0,0 +1,167 @@
+import struct
+import zlib
+import numpy as np
+
+# Binary point format:
+#   header: magic, version, flags, point count
+#   bases:  one int64 per delta-encoded column (its first quantized value)
+#   body:   int32 column arrays (deltas, except elevation), optionally zlib'd
+MAGIC = b'SPT'
+VERSION = 1
+FLAG_COMPRESSED = 0x01
+HEADER = struct.Struct('<3sBBI')
+
+# Column name, quantization scale and whether it is delta encoded
+COLUMNS = (
+    ('lat', 1e7, True),      # 1e-7 degrees (~1 cm)
+    ('lon', 1e7, True),
+    ('time', 1e3, True),     # Milliseconds since the epoch
+    ('speed', 1e3, True),    # 1e-3 knots
+    ('ele', 1e2, False)      # Centimeters, absolute so gaps can be marked
+)
+DELTA_COLUMNS = [name for name, _, delta in COLUMNS if delta]
+MISSING = np.iinfo(np.int32).min  # Marks a missing elevation
+
+# Quantized longitude spans one turn; deltas are wrapped into half a turn
+# so a step across the antimeridian stays small instead of overflowing
+LON_TURN = 360 * 10 ** 7
+LON_HALF_TURN = LON_TURN // 2
+
+
+def encode_points(lat, lon, time, speed, ele=None, compress=True):
+    """
+    Encode a track's points into a compact binary blob
+    
+    Coordinates, times and speeds are quantized to integers and stored as
+    deltas from the previous point, which are small and compress well.
+    Longitude deltas are wrapped, so tracks crossing the antimeridian
+    round-trip:
+    
+        >>> decode_points(encode_points([0, 0], [179.99999, -179.99999], [0, 1], [0, 0]))['lon']
+        array([ 179.99999, -179.99999])
+    
+    Args:
+        lat: Array of latitudes in degrees
+        lon: Array of longitudes in degrees
+        time: Array of timestamps in epoch seconds
+        speed: Array of speeds in knots
+        ele: Optional array of elevations in meters (NaN when missing)
+        compress: Whether to zlib-compress the body
+    
+    Returns:
+        bytes: The encoded points
+    
+    Raises:
+        ValueError: If a delta or elevation does not fit in 32 bits
+    """
+    point_count = len(time)
+    values = {
+        'lat': lat,
+        'lon': lon,
+        'time': time,
+        'speed': speed,
+        'ele': np.full(point_count, np.nan) if ele is None else ele
+    }
+    
+    bases = []
+    body = []
+    for name, scale, delta in COLUMNS:
+        column = np.asarray(values[name], dtype=np.float64) * scale
+        if delta:
+            quantized = np.round(column).astype(np.int64)
+            base = int(quantized[0]) if point_count else 0
+            bases.append(base)
+            encoded = np.diff(quantized, prepend=base)
+            if name == 'lon':
+                encoded = (encoded + LON_HALF_TURN) % LON_TURN - LON_HALF_TURN
+        else:
+            missing = np.isnan(column)
+            encoded = np.round(np.where(missing, 0, column)).astype(np.int64)
+            encoded[missing] = MISSING
+        if point_count and (encoded.min() < MISSING or encoded.max() > np.iinfo(np.int32).max):
+            raise ValueError(f"Point {name} values out of range for encoding")
+        body.append(encoded.astype('<i4').tobytes())
+    
+    body = b''.join(body)
+    flags = 0
+    if compress:
+        body = zlib.compress(body)
+        flags |= FLAG_COMPRESSED
+    
+    header = HEADER.pack(MAGIC, VERSION, flags, point_count)
+    return header + struct.pack(f'<{len(bases)}q', *bases) + body
+
+
+def decode_points(data):
+    """
+    Decode a blob produced by encode_points
+    
+    Args:
+        data: Encoded bytes
+    
+    Returns:
+        dict: 'lat', 'lon', 'time' (epoch seconds), 'speed' and 'ele'
+              float64 arrays
+    """
+    magic, version, flags, point_count = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unrecognized point encoding")
+    
+    offset = HEADER.size
+    bases = struct.unpack_from(f'<{len(DELTA_COLUMNS)}q', data, offset)
+    offset += 8 * len(DELTA_COLUMNS)
+    
+    body = data[offset:]
+    if flags & FLAG_COMPRESSED:
+        body = zlib.decompress(body)
+    raw = np.frombuffer(body, dtype='<i4').reshape(len(COLUMNS), point_count)
+    
+    result = {}
+    bases = dict(zip(DELTA_COLUMNS, bases))
+    for row, (name, scale, delta) in zip(raw, COLUMNS):
+        if delta:
+            quantized = np.cumsum(row, dtype=np.int64) + bases[name]
+            if name == 'lon':
+                # Undo the delta wrapping; in-range values are left as is
+                quantized = np.where(quantized > LON_HALF_TURN, quantized - LON_TURN, quantized)
+                quantized = np.where(quantized < -LON_HALF_TURN, quantized + LON_TURN, quantized)
+            result[name] = quantized / scale
+        else:
+            column = row.astype(np.float64) / scale
+            column[row == MISSING] = np.nan
+            result[name] = column
+    
+    return result
+
+
+def decode_point_dicts(data):
+    """
+    Decode a blob into the list-of-dicts form used by the old points_json
+    
+    Returns:
+        list: Dicts with 'lat', 'lon', 'ele', 'time' (ISO string) and 'speed'
+    """
+    columns = decode_points(data)
+    elevations = [None if ele != ele else ele for ele in columns['ele'].tolist()]
+    
+    # Format all timestamps at once; whole seconds match datetime.isoformat()
+    epoch_ms = np.round(columns['time'] * 1000).astype(np.int64)
+    unit = 's' if not (epoch_ms % 1000).any() else 'us'
+    times = np.datetime_as_string(epoch_ms.astype('datetime64[ms]'), unit=unit)
+    
+    return [
+        {
+            'lat': lat,
+            'lon': lon,
+            'ele': ele,
+            'time': time + '+00:00',
+            'speed': speed
+        }
+        for lat, lon, ele, time, speed in zip(
+            columns['lat'].tolist(),
+            columns['lon'].tolist(),
+            elevations,
+            times.tolist(),
+            columns['speed'].tolist()
+        )
+    ]
\ No newline at end of file
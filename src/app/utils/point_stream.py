@@ -0,0 +1,155 @@
+import json
+import numpy as np
+from app.models.track_point import TrackPoint
+from app.models.race_track import TRACK_LAYOUT
+
+# Points fetched per keyset page while streaming
+POINT_PAGE_SIZE = 5000
+
+# Binary record field types, matching the packed track layout
+POINT_DTYPES = dict(TRACK_LAYOUT, point_index=np.dtype('<i8'))
+
+
+def parse_point_columns(value):
+    """
+    Parse the comma-separated columns query parameter
+    
+    Args:
+        value: e.g. 'latitude,longitude,speed'; empty means every column
+    
+    Returns:
+        list: Requested column names in API_COLUMNS order
+    
+    Raises:
+        ValueError: If a column name is not recognized
+    """
+    if not value:
+        return list(TrackPoint.API_COLUMNS)
+    
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(TrackPoint.API_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+    
+    return [name for name in TrackPoint.API_COLUMNS if name in requested]
+
+
+def parse_point_range(after, limit):
+    """
+    Parse the after and limit query parameters
+    
+    Both are optional, but a cursor before the first point or a limit
+    below one is an error rather than an empty stream:
+    
+        >>> parse_point_range('99', '500')
+        (99, 500)
+        >>> parse_point_range(None, None)
+        (None, None)
+        >>> parse_point_range(None, '-1')
+        Traceback (most recent call last):
+            ...
+        ValueError: limit must be a positive integer
+        >>> parse_point_range('-1', None)
+        Traceback (most recent call last):
+            ...
+        ValueError: after must be a non-negative integer
+    
+    Returns:
+        tuple: (after_index, limit), None where not given
+    
+    Raises:
+        ValueError: If either is not an integer or is out of range
+    """
+    def parse(value, name, minimum, kind):
+        if value is None:
+            return None
+        try:
+            number = int(value)
+        except ValueError:
+            number = None
+        if number is None or number < minimum:
+            raise ValueError(f"{name} must be a {kind} integer")
+        return number
+    
+    return (
+        parse(after, 'after', 0, 'non-negative'),
+        parse(limit, 'limit', 1, 'positive')
+    )
+
+
+def iter_point_pages(race_id, columns, after_index=None, limit=None, page_size=POINT_PAGE_SIZE):
+    """
+    Walk a race's points one keyset page at a time
+    
+    Only one page is held in memory, however long the track.
+    
+    Args:
+        race_id: ID of the race
+        columns: Column names to fetch
+        after_index: Start after this point_index
+        limit: Optional maximum number of points overall
+        page_size: Points per page
+    
+    Yields:
+        dict: Column arrays as returned by TrackPoint.get_point_page
+    """
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page = TrackPoint.get_point_page(race_id, columns, after_index, size)
+        
+        count = len(page['point_index'])
+        if not count:
+            return
+        yield page
+        
+        if count < size:
+            return
+        after_index = int(page['point_index'][-1])
+        if remaining is not None:
+            remaining -= count
+
+
+def point_record_dtype(columns):
+    """Get the structured dtype of one binary point record"""
+    return np.dtype([(name, POINT_DTYPES[name]) for name in ['point_index'] + list(columns)])
+
+
+def iter_ndjson(pages):
+    """
+    Encode point pages as newline-delimited JSON, one chunk per page
+    
+    Each line is one point; timestamps are ISO strings and missing values
+    are null.
+    """
+    for page in pages:
+        names = list(page)
+        values = []
+        for name in names:
+            column = page[name]
+            if name == 'timestamp':
+                unit = 's' if not (column % 1000).any() else 'ms'
+                values.append(np.datetime_as_string(column.astype('datetime64[ms]'), unit=unit).tolist())
+            elif column.dtype.kind == 'f':
+                values.append([None if value != value else value for value in column.tolist()])
+            else:
+                values.append(column.tolist())
+        
+        yield ''.join(
+            json.dumps(dict(zip(names, row))) + '\n'
+            for row in zip(*values)
+        ).encode()
+
+
+def iter_binary(pages, dtype):
+    """
+    Encode point pages as packed little-endian records, one chunk per page
+    
+    Clients decode the body with numpy.frombuffer(body, dtype); timestamps
+    are epoch milliseconds.
+    """
+    for page in pages:
+        records = np.empty(len(page['point_index']), dtype=dtype)
+        for name in dtype.names:
+            records[name] = page[name]
+        yield records.tobytes()
@@ -0,0 +1,163 @@
+import numpy as np
+from app import db
+from app.models.track_point import TrackPoint
+from app.models.race_track import RaceTrack, datetime_to_epoch_ms, epoch_ms_to_datetime
+from app.models.wind_sample import WindSample
+from app.utils.wind_model import wind_at_times
+from app.utils.maneuver_detector import estimate_track_wind, detect_race_maneuvers, MANEUVER_REACH
+from app.utils.segment_classifier import classify_race_segments, reclassify_race_segments
+
+
+def load_analysis_columns(race_id, start=None, end=None, after_index=None, limit=None):
+    """
+    Load the arrays track analysis needs for a race in one query
+    
+    Args:
+        race_id: ID of the race
+        start: Optional earliest time (epoch milliseconds)
+        end: Optional latest time (epoch milliseconds)
+        after_index: Only points with a greater point_index
+        limit: Optional maximum number of points
+    
+    Returns:
+        dict: 'time' (epoch seconds), 'latitude', 'longitude', 'speed',
+              'heading', 'point_index' and 'point_id' (None in columnar
+              storage, which has no TrackPoint rows), in point_index order
+    """
+    if TrackPoint.uses_columnar_storage():
+        view = RaceTrack.get_view(race_id)
+        if after_index is not None:
+            view = view[max(after_index + 1, 0):]
+        first = 0 if start is None else int(np.searchsorted(view.timestamp, start, side='left'))
+        last = len(view) if end is None else int(np.searchsorted(view.timestamp, end, side='right'))
+        if limit:
+            last = min(last, first + limit)
+        view = view[first:max(first, last)]
+        return {
+            'time': view.timestamp / 1000.0,
+            'latitude': view.latitude,
+            'longitude': view.longitude,
+            'speed': view.speed.astype(np.float64),
+            'heading': view.heading.astype(np.float64),
+            'point_index': np.arange(view.start_index, view.start_index + len(view)),
+            'point_id': None
+        }
+    
+    query = db.session.query(
+        TrackPoint.point_id,
+        TrackPoint.point_index,
+        TrackPoint.timestamp,
+        TrackPoint.latitude,
+        TrackPoint.longitude,
+        TrackPoint.speed,
+        TrackPoint.heading
+    ).filter_by(race_id=race_id)
+    if start is not None:
+        query = query.filter(TrackPoint.timestamp >= epoch_ms_to_datetime(start))
+    if end is not None:
+        query = query.filter(TrackPoint.timestamp <= epoch_ms_to_datetime(end))
+    if after_index is not None:
+        query = query.filter(TrackPoint.point_index > after_index)
+    query = query.order_by(TrackPoint.point_index)
+    if limit:
+        query = query.limit(limit)
+    rows = query.all()
+    
+    point_ids, point_indexes, timestamps, lats, lons, speeds, headings = zip(*rows) if rows else ((),) * 7
+    return {
+        'time': np.array([datetime_to_epoch_ms(t) for t in timestamps], dtype=np.float64) / 1000.0,
+        'latitude': np.array(lats, dtype=np.float64),
+        'longitude': np.array(lons, dtype=np.float64),
+        'speed': np.array(speeds, dtype=np.float64),
+        'heading': np.array(headings, dtype=np.float64),
+        'point_index': np.array(point_indexes, dtype=np.int64),
+        'point_id': np.array(point_ids, dtype=np.int64)
+    }
+
+
+def get_race_wind(race, columns):
+    """
+    Get the wind at every point of a race
+    
+    Uses the race's wind timeline, then its single wind direction, and
+    otherwise estimates a constant direction from the track's turns.
+    
+    Returns:
+        tuple: (directions in degrees, speeds in knots, NaN where unknown)
+               arrays, or (None, None) if the direction is unknown
+    """
+    times = columns['time']
+    directions, speeds = wind_at_times(
+        WindSample.get_timeline(race.race_id),
+        np.round(times * 1000),
+        race.wind_direction
+    )
+    if directions is not None:
+        return directions, speeds
+    
+    estimate = estimate_track_wind(times, columns['speed'], columns['heading'])
+    if estimate is None:
+        return None, None
+    return np.full(len(times), estimate), np.full(len(times), np.nan)
+
+
+def analyze_race(race, window=None):
+    """
+    Rebuild a race's maneuvers and segments from its stored track
+    
+    The track is loaded once and shared by both passes. Runs after
+    processing and whenever the race's wind changes. Given the window a
+    wind timeline edit changed, only the maneuvers and segments it can
+    reach are rebuilt; a wind estimated from the whole track still needs
+    a full pass. The caller commits.
+    
+    Args:
+        race: Race to analyze
+        window: Optional (start, end) epoch milliseconds, None meaning
+                unbounded, as returned by wind_model.sample_window
+    
+    Returns:
+        dict: Number of 'maneuvers' and 'segments' stored
+    """
+    timeline = WindSample.get_timeline(race.race_id)
+    if (window is not None and window != (None, None)
+            and (timeline or race.wind_direction is not None)):
+        return _analyze_window(race, window, timeline)
+    
+    columns = load_analysis_columns(race.race_id)
+    wind, wind_speed = get_race_wind(race, columns) if len(columns['time']) else (None, None)
+    
+    return {
+        'maneuvers': detect_race_maneuvers(race, columns, wind, wind_speed),
+        'segments': classify_race_segments(race, columns, wind)
+    }
+
+
+def _analyze_window(race, window, timeline):
+    """Rebuild the maneuvers and segments a bounded wind edit can reach"""
+    def wind_for(times):
+        return wind_at_times(timeline, np.round(times * 1000), race.wind_direction)
+    
+    # Maneuvers centered near the window read wind inside it
+    reach = round(MANEUVER_REACH * 1000)
+    maneuver_window = _widen(window, reach)
+    columns = load_analysis_columns(race.race_id, *_widen(maneuver_window, reach))
+    wind, wind_speed = wind_for(columns['time'])
+    
+    return {
+        'maneuvers': detect_race_maneuvers(race, columns, wind, wind_speed, maneuver_window),
+        'segments': reclassify_race_segments(
+            race, window,
+            lambda times: wind_for(times)[0],
+            lambda after_index, limit: load_analysis_columns(race.race_id, after_index=after_index, limit=limit)
+        )
+    }
+
+
+def _widen(window, margin):
+    """Widen a (start, end) window by margin either side, keeping None"""
+    start, end = window
+    return (
+        None if start is None else start - margin,
+        None if end is None else end + margin
+    )
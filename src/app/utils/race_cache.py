@@ -0,0 +1,80 @@
+import weakref
+from collections import OrderedDict
+
+# Every RaceCache created, so a race's entries can be dropped everywhere at once
+_caches = weakref.WeakSet()
+
+
+class RaceCache:
+    """
+    Small in-process LRU cache for data derived from a race's points
+    
+    Entries are keyed by (race_id, track_updated_at). Anything that
+    rewrites a race's points bumps track_updated_at (see
+    Race.invalidate_track_caches), so stale entries are never served, even
+    by other worker processes. Edits that leave the points alone, such as
+    renaming or cropping a race, keep the cached entries.
+    """
+    
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        _caches.add(self)
+    
+    def get(self, race_id, updated_at, loader):
+        """
+        Get the cached value for a race, building it with loader() on a miss
+        
+        Args:
+            race_id: ID of the race
+            updated_at: The race's current track_updated_at
+            loader: Callable returning the value to cache
+        
+        Returns:
+            The cached or newly built value
+        """
+        cache_key = (race_id, updated_at)
+        if cache_key in self._entries:
+            self._entries.move_to_end(cache_key)
+            return self._entries[cache_key]
+        
+        value = loader()
+        self.put(race_id, updated_at, value)
+        return value
+    
+    def peek(self, race_id, updated_at, default=None):
+        """Get the cached value for a race without building it on a miss"""
+        cache_key = (race_id, updated_at)
+        if cache_key not in self._entries:
+            return default
+        self._entries.move_to_end(cache_key)
+        return self._entries[cache_key]
+    
+    def put(self, race_id, updated_at, value):
+        """Cache a value built outside get(), e.g. for many races at once"""
+        self._entries[(race_id, updated_at)] = value
+        self._entries.move_to_end((race_id, updated_at))
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+    
+    def invalidate(self, race_id):
+        """Drop every entry for a race"""
+        for cache_key in [key for key in self._entries if key[0] == race_id]:
+            del self._entries[cache_key]
+    
+    def clear(self):
+        """Drop every entry"""
+        self._entries.clear()
+
+
+def invalidate_race(race_id):
+    """Drop a race's entries from every RaceCache in this process"""
+    for cache in list(_caches):
+        cache.invalidate(race_id)
+
+
+def get_track_updated_at(race_id):
+    """Look up a race's track_updated_at, the version part of cache keys"""
+    from app import db
+    from app.models.race import Race
+    return db.session.query(Race.track_updated_at).filter_by(race_id=race_id).scalar()
\ No newline at end of file
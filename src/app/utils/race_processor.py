@@ -0,0 +1,178 @@
+from datetime import datetime, timezone
+import numpy as np
+from app import db
+from app.models.race import Race
+from app.models.track_point import TrackPoint
+from app.models.race_track import RaceTrack
+from app.models.user_stats import UserStats
+from app.models.wind_sample import WindSample
+from app.models.maneuver import Maneuver
+from app.utils.file_utils import parse_gpx_path
+from app.utils.track_metrics import (
+    compute_track_metrics, compute_wind_metrics, METERS_PER_NM
+)
+from app.utils.track_filter import filter_track
+from app.utils.wind_model import wind_at_times, recompute_wind_metrics
+from app.utils.race_analysis import analyze_race
+
+def load_race_columns(race):
+    """
+    Parse and validate a race's stored GPX file into columnar arrays
+    
+    Args:
+        race: Race whose GPX file should be read
+    
+    Returns:
+        TrackColumns: Columnar track data for the race
+    
+    Raises:
+        ValueError: If the file is not a GPX file with timestamped points
+    """
+    success, result = parse_gpx_path(race.get_gpx_full_path())
+    if not success:
+        raise ValueError(result)
+    return result
+
+def process_race(race_id, columns=None, date_from_track=False):
+    """
+    Parse and analyze a race, storing its track points and statistics
+    
+    Must run inside an application context. Any existing analysis for the
+    race is replaced. Failures are recorded on the race rather than raised.
+    
+    Args:
+        race_id: ID of the race to process
+        columns: Optional TrackColumns already parsed from the upload, so
+                 the GPX file does not have to be read again
+        date_from_track: Set the race's date from its first track point
+    
+    Returns:
+        bool: True if the race was processed successfully
+    """
+    race = db.session.get(Race, race_id)
+    if race is None:
+        return False
+    
+    try:
+        if columns is None:
+            columns = load_race_columns(race)
+        if not len(columns.time):
+            raise ValueError("No timestamped track points found in GPX file")
+        
+        # Drop GPS glitches and jitter before anything is derived from positions
+        columns = filter_track(columns)
+        if date_from_track:
+            race.race_date = epoch_to_datetime(columns.time[0])
+        metrics = compute_track_metrics(columns.lat, columns.lon, columns.time)
+        wind_directions, _ = wind_at_times(
+            WindSample.get_timeline(race_id),
+            np.round(columns.time * 1000),
+            race.wind_direction
+        )
+        metrics['true_wind_angle'], metrics['vmg'] = compute_wind_metrics(
+            metrics['speed'], metrics['heading'], wind_directions
+        )
+        
+        # Replace any previous analysis of this race; maneuvers reference
+        # track points, so they go first
+        Maneuver.query.filter_by(race_id=race_id).delete()
+        if TrackPoint.uses_columnar_storage():
+            RaceTrack.store(race_id, track_columns(columns, metrics))
+        else:
+            TrackPoint.query.filter_by(race_id=race_id).delete()
+            TrackPoint.bulk_insert(race_id, track_point_rows(columns, metrics))
+        db.session.flush()
+        analyze_race(race)
+        
+        race.total_distance = float(metrics['cumulative_distance'][-1]) / METERS_PER_NM
+        race.duration = int(metrics['duration'])
+        race.max_speed = metrics['max_speed']
+        race.avg_speed = metrics['avg_speed']
+        race.track_point_count = len(columns.time)
+        race.is_processed = True
+        race.processing_error = None
+        race.invalidate_track_caches()
+        UserStats.refresh(race.user_id)
+        db.session.commit()
+        return True
+    
+    except Exception as e:
+        db.session.rollback()
+        race = db.session.get(Race, race_id)
+        if race is not None:
+            race.is_processed = False
+            race.processing_error = f"Error processing race: {str(e)}"
+            db.session.commit()
+        return False
+
+def update_wind_direction(race_id, wind_direction):
+    """
+    Set a race's wind direction and recompute VMG and TWA for every point
+    
+    The direction applies wherever the race has no wind timeline (see
+    wind_model). Speed and heading are loaded as arrays, the new values
+    are computed in one vectorized step and written back in bulk; no
+    TrackPoint objects are built.
+    
+    Args:
+        race_id: ID of the race
+        wind_direction: Direction the wind blows from in degrees, or None
+    
+    Returns:
+        int: Number of points updated
+    """
+    race = db.session.get(Race, race_id)
+    if race is None:
+        return 0
+    
+    race.wind_direction = wind_direction
+    point_count = recompute_wind_metrics(race)
+    analyze_race(race)
+    race.invalidate_track_caches()
+    db.session.commit()
+    return point_count
+
+def track_columns(columns, metrics):
+    """Get the RaceTrack columns for columnar track data and its metrics"""
+    return {
+        'latitude': columns.lat,
+        'longitude': columns.lon,
+        'timestamp': np.round(columns.time * 1000).astype(np.int64),
+        'elevation': columns.ele,
+        'speed': metrics['speed'],
+        'heading': metrics['heading'],
+        'vmg': metrics['vmg'],
+        'true_wind_angle': metrics['true_wind_angle']
+    }
+
+def track_point_rows(columns, metrics):
+    """Yield TrackPoint column dicts from columnar track data and its metrics"""
+    elevations = np.where(np.isnan(columns.ele), None, columns.ele).tolist()
+    vmgs = np.where(np.isnan(metrics['vmg']), None, metrics['vmg']).tolist()
+    wind_angles = np.where(np.isnan(metrics['true_wind_angle']), None, metrics['true_wind_angle']).tolist()
+    
+    for index, (lat, lon, ele, epoch, speed, heading, vmg, wind_angle) in enumerate(zip(
+        columns.lat.tolist(),
+        columns.lon.tolist(),
+        elevations,
+        columns.time.tolist(),
+        metrics['speed'].tolist(),
+        metrics['heading'].tolist(),
+        vmgs,
+        wind_angles
+    )):
+        yield {
+            'latitude': lat,
+            'longitude': lon,
+            'elevation': ele,
+            'timestamp': epoch_to_datetime(epoch),
+            'speed': speed,
+            'heading': heading,
+            'vmg': vmg,
+            'true_wind_angle': wind_angle,
+            'point_index': index
+        }
+
+def epoch_to_datetime(epoch):
+    """Convert epoch seconds to a naive UTC datetime for DateTime columns"""
+    return datetime.fromtimestamp(epoch, timezone.utc).replace(tzinfo=None)
\ No newline at end of file
@@ -0,0 +1,89 @@
+from app import db
+from app.models.race import Race
+from app.models.maneuver import Maneuver
+from app.models.race_segment import RaceSegment
+from app.utils.race_cache import RaceCache
+
+# Maneuver and segment stats by (race_id, track_updated_at); maneuvers and
+# segments are only rebuilt alongside Race.invalidate_track_caches
+_stats_cache = RaceCache(max_size=512)
+
+
+def get_race_stats(race_ids):
+    """
+    Get maneuver and segment statistics by type for many races
+    
+    Cached races are served from memory; the rest are fetched with one
+    grouped query per table, however many races are missing.
+    
+    Args:
+        race_ids: IDs of the races
+    
+    Returns:
+        dict: {'maneuvers': ..., 'segments': ...} stats by type, by race
+              ID, for the races that exist
+    """
+    versions = dict(
+        db.session.query(Race.race_id, Race.track_updated_at).filter(Race.race_id.in_(list(race_ids))).all()
+    )
+    
+    stats = {}
+    missing = []
+    for race_id, track_updated_at in versions.items():
+        cached = _stats_cache.peek(race_id, track_updated_at)
+        if cached is None:
+            missing.append(race_id)
+        else:
+            stats[race_id] = cached
+    
+    if missing:
+        maneuvers = Maneuver.get_maneuver_stats_for_races(missing)
+        segments = RaceSegment.get_segment_stats_for_races(missing)
+        for race_id in missing:
+            stats[race_id] = {
+                'maneuvers': maneuvers.get(race_id, {}),
+                'segments': segments.get(race_id, {})
+            }
+            _stats_cache.put(race_id, versions[race_id], stats[race_id])
+    
+    return stats
+
+
+def _combine(groups, averaged, summed=()):
+    """Merge stats for one type across races, weighting averages by count"""
+    count = sum(group['count'] for group in groups)
+    combined = {'count': count}
+    for name in averaged:
+        weighted = [(group[name], group['count']) for group in groups if group[name] is not None]
+        weight = sum(group_count for _, group_count in weighted)
+        combined[name] = sum(value * group_count for value, group_count in weighted) / weight if weight else None
+    for name in summed:
+        combined[name] = sum(group[name] or 0 for group in groups)
+    return combined
+
+
+def combine_race_stats(stats):
+    """
+    Combine per-race stats from get_race_stats into totals across races
+    
+    Returns:
+        dict: {'maneuvers': ..., 'segments': ...} stats by type
+    """
+    maneuvers = {}
+    segments = {}
+    for race_stats in stats.values():
+        for type_value, group in race_stats['maneuvers'].items():
+            maneuvers.setdefault(type_value, []).append(group)
+        for type_value, group in race_stats['segments'].items():
+            segments.setdefault(type_value, []).append(group)
+    
+    return {
+        'maneuvers': {
+            type_value: _combine(groups, ('avg_duration', 'avg_speed_loss', 'avg_efficiency'))
+            for type_value, groups in maneuvers.items()
+        },
+        'segments': {
+            type_value: _combine(groups, ('avg_speed', 'avg_vmg'), ('total_distance',))
+            for type_value, groups in segments.items()
+        }
+    }
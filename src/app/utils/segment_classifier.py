@@ -0,0 +1,287 @@
+from datetime import datetime
+import numpy as np
+from app import db
+from app.models.race_segment import RaceSegment, SegmentType
+from app.models.race_track import epoch_ms_to_datetime
+from app.utils.track_metrics import compute_wind_metrics, haversine_array, METERS_PER_NM
+
+# True wind angle bands in degrees
+UPWIND_MAX_TWA = 70.0     # Closer to the wind than this is upwind
+DOWNWIND_MIN_TWA = 110.0  # Further off the wind than this is downwind
+HYSTERESIS = 10.0         # Extra angle needed to leave the current band
+MIN_SEGMENT_DURATION = 30.0  # Seconds a new band must hold to start a segment
+SEGMENT_CHUNK_SIZE = 5000    # Points loaded at a time when reclassifying part of a race
+
+
+def point_segment_type(true_wind_angle, current=None):
+    """
+    Classify one point by true wind angle, with hysteresis
+    
+    The band the boat is already in is widened by HYSTERESIS and the
+    others narrowed, so a TWA wandering around a threshold does not flip
+    the classification back and forth.
+    """
+    upwind_max = UPWIND_MAX_TWA + (HYSTERESIS if current is SegmentType.UPWIND else -HYSTERESIS)
+    downwind_min = DOWNWIND_MIN_TWA - (HYSTERESIS if current is SegmentType.DOWNWIND else -HYSTERESIS)
+    
+    if true_wind_angle <= upwind_max:
+        return SegmentType.UPWIND
+    if true_wind_angle >= downwind_min:
+        return SegmentType.DOWNWIND
+    return SegmentType.REACHING
+
+
+class SegmentRun:
+    """Running aggregates for one run of same-type points"""
+    
+    def __init__(self, segment_type, index, time):
+        self.segment_type = segment_type
+        self.start_index = self.end_index = index
+        self.start_time = self.end_time = time
+        self.count = 0
+        self.speed_sum = 0.0
+        self.vmg_sum = 0.0
+        self.vmg_count = 0
+        self.distance = 0.0
+    
+    def add(self, index, time, speed, vmg, distance):
+        """Extend the run by one point"""
+        self.end_index = index
+        self.end_time = time
+        self.count += 1
+        self.speed_sum += speed
+        if vmg == vmg:  # Skip NaN
+            self.vmg_sum += vmg
+            self.vmg_count += 1
+        self.distance += distance
+    
+    def absorb(self, other):
+        """Extend the run by a following run"""
+        self.end_index = other.end_index
+        self.end_time = other.end_time
+        self.count += other.count
+        self.speed_sum += other.speed_sum
+        self.vmg_sum += other.vmg_sum
+        self.vmg_count += other.vmg_count
+        self.distance += other.distance
+    
+    def to_segment(self):
+        """Get the RaceSegment column values for the run"""
+        return {
+            'segment_type': self.segment_type,
+            'start_time': self.start_time,
+            'end_time': self.end_time,
+            'avg_speed': self.speed_sum / self.count if self.count else None,
+            'distance': self.distance / METERS_PER_NM,
+            'avg_vmg': self.vmg_sum / self.vmg_count if self.vmg_count else None,
+            'start_index': self.start_index,
+            'end_index': self.end_index
+        }
+
+
+def classify_segments(points, initial_type=None, start_index=0):
+    """
+    Split a track into upwind, downwind and reaching segments in one pass
+    
+    Points are classified by true wind angle with hysteresis and
+    run-length encoded. A change of band only starts a new segment once
+    it has held for MIN_SEGMENT_DURATION; shorter excursions (a maneuver,
+    a gust) stay in the segment around them. Aggregates build up as the
+    points stream past, so nothing is re-scanned.
+    
+    Args:
+        points: Iterable of (time in epoch seconds, true wind angle,
+                speed, vmg, distance in meters from the previous point)
+        initial_type: Optional SegmentType to open the first segment in,
+                      to resume classification at a stored segment
+        start_index: point_index of the first point
+    
+    Yields:
+        dict: RaceSegment column values, in time order
+    """
+    current = None
+    pending = None
+    
+    for index, (time, true_wind_angle, speed, vmg, distance) in enumerate(points, start_index):
+        if current is None:
+            if initial_type is not None:
+                current = SegmentRun(initial_type, index, time)
+            elif true_wind_angle != true_wind_angle:
+                continue
+            else:
+                current = SegmentRun(point_segment_type(true_wind_angle), index, time)
+        
+        # Points with no wind angle carry on whatever run is open
+        if true_wind_angle != true_wind_angle:
+            segment_type = (pending or current).segment_type
+        else:
+            segment_type = point_segment_type(true_wind_angle, current.segment_type)
+        
+        if segment_type is current.segment_type:
+            if pending is not None:
+                # The excursion ended before it counted
+                current.absorb(pending)
+                pending = None
+            current.add(index, time, speed, vmg, distance)
+            continue
+        
+        if pending is not None and pending.segment_type is not segment_type:
+            current.absorb(pending)
+            pending = None
+        if pending is None:
+            pending = SegmentRun(segment_type, index, time)
+        pending.add(index, time, speed, vmg, distance)
+        
+        if pending.end_time - pending.start_time >= MIN_SEGMENT_DURATION:
+            yield current.to_segment()
+            current = pending
+            pending = None
+    
+    if current is not None:
+        if pending is not None:
+            current.absorb(pending)
+        yield current.to_segment()
+
+
+def classify_race_segments(race, columns, wind):
+    """
+    Classify a race's track and replace its stored segments
+    
+    The caller commits.
+    
+    Args:
+        race: Race to analyze
+        columns: Track arrays from race_analysis.load_analysis_columns
+        wind: Wind direction per point in degrees, or None if unknown
+    
+    Returns:
+        int: Number of segments stored
+    """
+    RaceSegment.query.filter_by(race_id=race.race_id).delete()
+    times = columns['time']
+    if wind is None or not len(times):
+        return 0
+    
+    return _store_segments(race, classify_segments(_segment_points(columns, wind)))
+
+
+def reclassify_race_segments(race, window, wind_for, load_chunk):
+    """
+    Reclassify the part of a race's track a wind edit changed
+    
+    Classification restarts at the stored segment holding the window
+    start, in that segment's band, since every point before it is
+    unchanged. It streams forward a chunk at a time until, past the
+    window end, it yields a segment identical to a stored one; from there
+    on the stored segments still hold. Only the segments in between are
+    replaced. The caller commits.
+    
+    Args:
+        race: Race to analyze
+        window: (start, end) epoch milliseconds of the changed wind;
+                None for unbounded
+        wind_for: Function from an array of epoch seconds to wind
+                  directions in degrees
+        load_chunk: Function (after_index, limit) returning track arrays
+                    like race_analysis.load_analysis_columns
+    
+    Returns:
+        int: Number of segments stored
+    """
+    stored = RaceSegment.query.filter_by(race_id=race.race_id).order_by(RaceSegment.start_index).all()
+    start, end = window
+    restart = None
+    if start is not None:
+        window_start = epoch_ms_to_datetime(start)
+        for segment in stored:
+            if segment.start_time > window_start:
+                break
+            restart = segment
+    start_index = restart.start_index if restart is not None else 0
+    initial_type = restart.segment_type if restart is not None else None
+    window_end = None if end is None else end / 1000.0
+    stored_by_start = {segment.start_index: segment for segment in stored}
+    
+    def chunks():
+        # Include the point before the restart for its distance
+        after_index = start_index - 2
+        while True:
+            columns = load_chunk(after_index, SEGMENT_CHUNK_SIZE)
+            if not len(columns['time']):
+                return
+            yield columns, wind_for(columns['time'])
+            after_index = int(columns['point_index'][-1])
+    
+    segments = []
+    end_index = None
+    for segment in classify_segments(_stream_segment_points(chunks(), start_index), initial_type, start_index):
+        match = stored_by_start.get(segment['start_index'])
+        if (window_end is not None and segment['start_time'] > window_end and match is not None
+                and match.end_index == segment['end_index']
+                and match.segment_type is segment['segment_type']):
+            end_index = segment['start_index']
+            break
+        segments.append(segment)
+    
+    query = RaceSegment.query.filter(
+        RaceSegment.race_id == race.race_id,
+        RaceSegment.start_index >= start_index
+    )
+    if end_index is not None:
+        query = query.filter(RaceSegment.start_index < end_index)
+    query.delete(synchronize_session=False)
+    return _store_segments(race, segments)
+
+
+def _segment_points(columns, wind, previous=None):
+    """Get classify_segments' per-point values for track arrays"""
+    true_wind_angle, vmg = compute_wind_metrics(columns['speed'], columns['heading'], wind)
+    lat = columns['latitude']
+    lon = columns['longitude']
+    distance = np.zeros(len(lat))
+    distance[1:] = haversine_array(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    if previous is not None:
+        distance[0] = haversine_array(
+            np.array([previous[0]]), np.array([previous[1]]), lat[:1], lon[:1]
+        )[0]
+    return zip(
+        columns['time'].tolist(),
+        true_wind_angle.tolist(),
+        np.nan_to_num(columns['speed']).tolist(),
+        vmg.tolist(),
+        distance.tolist()
+    )
+
+
+def _stream_segment_points(chunks, start_index):
+    """Chain _segment_points over (columns, wind) chunks from start_index on"""
+    previous = None
+    for columns, wind in chunks:
+        skip = int(np.searchsorted(columns['point_index'], start_index))
+        if skip:
+            previous = (columns['latitude'][skip - 1], columns['longitude'][skip - 1])
+            columns = {name: values[skip:] for name, values in columns.items() if values is not None}
+            wind = wind[skip:]
+        if not len(columns['time']):
+            continue
+        yield from _segment_points(columns, wind, previous)
+        previous = (columns['latitude'][-1], columns['longitude'][-1])
+
+
+def _store_segments(race, segments):
+    """Bulk insert classify_segments output for a race, returning how many"""
+    created_at = datetime.utcnow()
+    rows = []
+    for segment in segments:
+        segment.update(
+            race_id=race.race_id,
+            start_time=epoch_ms_to_datetime(round(segment['start_time'] * 1000)),
+            end_time=epoch_ms_to_datetime(round(segment['end_time'] * 1000)),
+            created_at=created_at
+        )
+        rows.append(segment)
+    
+    if rows:
+        # One executemany for the whole race
+        db.session.execute(RaceSegment.__table__.insert(), rows)
+    return len(rows)
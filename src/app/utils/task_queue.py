@@ -0,0 +1,149 @@
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Application used by each worker process, created by _init_worker
+_worker_app = None
+
+
+def _init_worker(config_name):
+    """Create a fresh application (and database engine) in a worker process"""
+    global _worker_app
+    from app import create_app
+    _worker_app = create_app(config_name)
+
+
+def _run_race_job(race_id, columns, date_from_track):
+    """Process a race inside the worker's application context"""
+    from app.utils.race_processor import process_race
+    with _worker_app.app_context():
+        return process_race(race_id, columns, date_from_track)
+
+
+class RaceProcessingQueue:
+    """
+    Runs race parsing and analysis off the request thread
+    
+    Jobs go to a pool of worker processes so several races can be analyzed
+    at once on separate cores. Progress and failures are reported through
+    the race's is_processed / processing_error flags; a job that dies
+    before process_race can record its own error (a broken pool, a
+    pickling error, a failed commit) is recorded by the queue. When
+    RACE_PROCESSING_ASYNC is disabled (e.g. in testing) jobs run inline.
+    """
+    
+    def __init__(self, app=None, config_name='default'):
+        self._executor = None
+        self.app = None
+        self.config_name = config_name
+        self.is_async = True
+        self.max_workers = None
+        if app is not None:
+            self.init_app(app, config_name)
+    
+    def init_app(self, app, config_name='default'):
+        """Read the queue settings from the app config"""
+        self.app = app
+        self.config_name = config_name
+        self.is_async = app.config.get('RACE_PROCESSING_ASYNC', True)
+        self.max_workers = app.config.get('RACE_PROCESSING_WORKERS') or os.cpu_count()
+        app.extensions['race_queue'] = self
+    
+    def _get_executor(self):
+        """Start the worker pool on first use"""
+        if self._executor is None:
+            # Spawn rather than fork so workers never share the web
+            # process's database connections
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.config_name,)
+            )
+        return self._executor
+    
+    def submit(self, race_id, columns=None, date_from_track=False):
+        """
+        Queue a race for processing
+        
+        Without columns the worker parses the race's stored GPX file
+        itself, so parsing and analysis are one job.
+        
+        Args:
+            race_id: ID of the race to process
+            columns: Optional TrackColumns already parsed from the upload
+            date_from_track: Set the race's date from its first track point
+        
+        Returns:
+            Future: Resolves to True if the race was processed successfully
+        """
+        if not self.is_async:
+            from app.utils.race_processor import process_race
+            future = Future()
+            try:
+                future.set_result(process_race(race_id, columns, date_from_track))
+            except Exception as e:
+                future.set_exception(e)
+        else:
+            try:
+                future = self._get_executor().submit(_run_race_job, race_id, columns, date_from_track)
+            except (BrokenProcessPool, RuntimeError) as e:
+                future = Future()
+                future.set_exception(e)
+        
+        future.add_done_callback(lambda done: self._record_failure(race_id, done))
+        return future
+    
+    def _record_failure(self, race_id, future):
+        """
+        Record a job that raised instead of returning on the race
+        
+        Without this the race would stay unprocessed with no error and
+        show as processing forever.
+        """
+        if future.cancelled() or future.exception() is None:
+            return
+        
+        error = future.exception()
+        if isinstance(error, BrokenProcessPool):
+            # Start a fresh pool for the next job
+            self._executor = None
+        if self.app is None:
+            return
+        
+        from app import db
+        from app.models.race import Race
+        with self.app.app_context():
+            self.app.logger.error('Processing race %s failed: %r', race_id, error)
+            try:
+                race = db.session.get(Race, race_id)
+                if race is not None and not race.is_processed:
+                    race.processing_error = f"Error processing race: {str(error) or type(error).__name__}"
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception('Could not record the failure of race %s', race_id)
+    
+    def run(self, fn, *args):
+        """
+        Run a picklable module-level function on the worker pool
+        
+        Used for work such as parsing uploads that should spread across
+        cores but is not a whole race job.
+        
+        Returns:
+            Future: Resolves to the function's return value
+        """
+        if not self.is_async:
+            future = Future()
+            future.set_result(fn(*args))
+            return future
+        
+        return self._get_executor().submit(fn, *args)
+    
+    def shutdown(self, wait=True):
+        """Stop the worker pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
\ No newline at end of file
@@ -0,0 +1,230 @@
+import math
+import numpy as np
+from flask import current_app, has_app_context
+from numpy.lib.stride_tricks import sliding_window_view
+from app.utils.track_metrics import TrackColumns, EARTH_RADIUS_M, wrap_longitude
+from config import Config
+
+# Pipeline settings, read from the app config (defaults live on config.Config)
+FILTER_SETTINGS = (
+    'TRACK_FILTER_ENABLED',
+    'TRACK_OUTLIER_WINDOW',
+    'TRACK_OUTLIER_THRESHOLD',
+    'TRACK_OUTLIER_MIN_DEVIATION',
+    'TRACK_RESAMPLE_INTERVAL',
+    'TRACK_RESAMPLE_MAX_GAP',
+    'TRACK_SMOOTHING_WINDOW',
+    'TRACK_SMOOTHING_ORDER'
+)
+
+
+def get_filter_settings():
+    """Get the pipeline settings from the app config, or the Config defaults outside an app"""
+    if not has_app_context():
+        return {name: getattr(Config, name) for name in FILTER_SETTINGS}
+    return {name: current_app.config.get(name, getattr(Config, name)) for name in FILTER_SETTINGS}
+
+
+def split_runs(times, max_gap):
+    """
+    Split a track into runs of fixes with no gap longer than max_gap
+    
+    Returns:
+        list: slice per run, in track order
+    """
+    breaks = (np.flatnonzero(np.diff(times) > max_gap) + 1).tolist()
+    return [slice(start, end) for start, end in zip([0] + breaks, breaks + [len(times)])]
+
+
+def _to_local(lat, lon):
+    """
+    Project lat/lon to meters on a plane around the first fix
+    
+    Longitude differences are wrapped, so a track crossing the
+    antimeridian stays continuous and round-trips through _from_local:
+    
+        >>> lat, lon = np.array([0.0, 0.0]), np.array([179.9999, -179.9999])
+        >>> x, y, scale = _to_local(lat, lon)
+        >>> np.round(x, 1)
+        array([ 0. , 22.2])
+        >>> np.round(_from_local(x, y, lat[0], lon[0], scale)[1], 4)
+        array([ 179.9999, -179.9999])
+    """
+    scale = math.cos(math.radians(float(np.mean(lat))))
+    x = np.radians(wrap_longitude(lon - lon[0])) * EARTH_RADIUS_M * scale
+    y = np.radians(lat - lat[0]) * EARTH_RADIUS_M
+    return x, y, scale
+
+
+def _from_local(x, y, lat0, lon0, scale):
+    """Invert _to_local"""
+    return (
+        lat0 + np.degrees(y / EARTH_RADIUS_M),
+        wrap_longitude(lon0 + np.degrees(x / (EARTH_RADIUS_M * scale)))
+    )
+
+
+def find_outliers(x, y, window=9, threshold=4.0, min_deviation=20.0):
+    """
+    Flag fixes that jump away from their neighbours (a Hampel filter)
+    
+    Each fix is compared with the median position of the window around
+    it. Over a few seconds a boat moves nearly in a straight line, so the
+    median sits close to the true position. A fix further from it than
+    threshold robust deviations (scaled MAD) of its window, and at least
+    min_deviation meters, is an outlier. Runs of outliers shorter than half
+    the window are caught too.
+    
+    Args:
+        x, y: Positions in meters
+        window: Fixes per window (odd)
+        threshold: Number of robust deviations that marks an outlier
+        min_deviation: Deviation in meters below which nothing is flagged
+    
+    Returns:
+        ndarray: Boolean mask of outliers
+    """
+    n = len(x)
+    half = window // 2
+    if n < window or half < 1:
+        return np.zeros(n, dtype=bool)
+    
+    # Pad by repeating the end fixes so every fix has a full window
+    padded_x = np.pad(x, half, mode='edge')
+    padded_y = np.pad(y, half, mode='edge')
+    median_x = np.median(sliding_window_view(padded_x, window), axis=1)
+    median_y = np.median(sliding_window_view(padded_y, window), axis=1)
+    
+    deviation = np.hypot(x - median_x, y - median_y)
+    mad = np.median(sliding_window_view(np.pad(deviation, half, mode='edge'), window), axis=1)
+    return deviation > np.maximum(threshold * 1.4826 * mad, min_deviation)
+
+
+def resample_uniform(columns, interval, max_gap=10.0):
+    """
+    Resample a track onto evenly spaced times
+    
+    Positions and elevation are linearly interpolated. Times falling in a
+    gap longer than max_gap between logged fixes are left out rather than
+    invented.
+    
+    Args:
+        columns: TrackColumns in time order
+        interval: Seconds between resampled fixes
+        max_gap: Longest gap in seconds to interpolate across
+    
+    Returns:
+        TrackColumns: The resampled track
+    """
+    times = columns.time
+    if len(times) < 2:
+        return columns
+    
+    grid = np.arange(times[0], times[-1] + interval / 2, interval)
+    after = np.clip(np.searchsorted(times, grid, side='left'), 1, len(times) - 1)
+    gap = times[after] - times[after - 1]
+    grid = grid[(gap <= max_gap) | (grid == times[after]) | (grid == times[after - 1])]
+    
+    ele = columns.ele
+    known = ~np.isnan(ele)
+    return TrackColumns(
+        np.interp(grid, times, columns.lat),
+        np.interp(grid, times, columns.lon),
+        np.interp(grid, times[known], ele[known]) if known.any() else np.full(len(grid), np.nan),
+        grid
+    )
+
+
+def savgol_smooth(values, window=5, order=2):
+    """
+    Smooth a series with a Savitzky-Golay filter
+    
+    Fits a polynomial of the given order to every window by least squares
+    and takes its value at the window's center. This removes jitter while
+    keeping the shape of turns better than a moving average. The end fixes
+    take their values from the fit of the first and last full windows.
+    Fixes are assumed evenly spaced with no gaps (see resample_uniform
+    and split_runs).
+    
+    Args:
+        values: Series to smooth
+        window: Fixes per window (odd, greater than order)
+        order: Polynomial order
+    
+    Returns:
+        ndarray: Smoothed series
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = len(values)
+    half = window // 2
+    if n < window or half < 1 or order >= window:
+        return values
+    
+    offsets = np.arange(-half, half + 1)
+    vandermonde = np.vander(offsets, order + 1, increasing=True)
+    fit = np.linalg.pinv(vandermonde)  # Polynomial coefficients from a window
+    
+    smoothed = np.empty(n)
+    # Value at the center is the constant coefficient
+    smoothed[half:n - half] = np.convolve(values, fit[0][::-1], mode='valid')
+    # Ends: evaluate the first and last windows' fits at their outer offsets
+    smoothed[:half] = vandermonde[:half] @ (fit @ values[:window])
+    smoothed[n - half:] = vandermonde[half + 1:] @ (fit @ values[n - window:])
+    return smoothed
+
+
+def filter_track(columns, settings=None):
+    """
+    Clean a raw GPS track before speed, heading and VMG are derived from it
+    
+    Drops outlier fixes, optionally resamples onto an even time grid and
+    smooths the positions, all as whole-array operations. Both the outlier
+    and smoothing windows count fixes, not seconds, so they run separately
+    on each stretch of track between gaps longer than TRACK_RESAMPLE_MAX_GAP;
+    otherwise fixes from either side of a dropout would be blended together.
+    Each stage is configured through the TRACK_* settings (see
+    FILTER_SETTINGS).
+    
+    Args:
+        columns: TrackColumns in time order
+        settings: Pipeline settings; read from the app config when None
+    
+    Returns:
+        TrackColumns: The cleaned track
+    """
+    if settings is None:
+        settings = get_filter_settings()
+    if not settings['TRACK_FILTER_ENABLED'] or len(columns.time) < 3:
+        return columns
+    
+    max_gap = settings['TRACK_RESAMPLE_MAX_GAP']
+    
+    x, y, _ = _to_local(columns.lat, columns.lon)
+    outliers = np.zeros(len(x), dtype=bool)
+    for run in split_runs(columns.time, max_gap):
+        outliers[run] = find_outliers(
+            x[run], y[run],
+            settings['TRACK_OUTLIER_WINDOW'],
+            settings['TRACK_OUTLIER_THRESHOLD'],
+            settings['TRACK_OUTLIER_MIN_DEVIATION']
+        )
+    if outliers.any():
+        keep = ~outliers
+        columns = TrackColumns(*(column[keep] for column in columns))
+    
+    if settings['TRACK_RESAMPLE_INTERVAL']:
+        columns = resample_uniform(columns, settings['TRACK_RESAMPLE_INTERVAL'], max_gap)
+    
+    window = settings['TRACK_SMOOTHING_WINDOW']
+    if window and len(columns.time) >= window:
+        lat0, lon0 = columns.lat[0], columns.lon[0]
+        x, y, scale = _to_local(columns.lat, columns.lon)
+        order = settings['TRACK_SMOOTHING_ORDER']
+        # Runs shorter than the window are left as logged
+        for run in split_runs(columns.time, max_gap):
+            x[run] = savgol_smooth(x[run], window, order)
+            y[run] = savgol_smooth(y[run], window, order)
+        lat, lon = _from_local(x, y, lat0, lon0, scale)
+        columns = TrackColumns(lat, lon, columns.ele, columns.time)
+    
+    return columns
@@ -0,0 +1,172 @@
+from bisect import bisect_left
+import numpy as np
+from app import db
+from app.models.track_point import TrackPoint
+from app.models.race_track import RaceTrack, TrackView, datetime_to_epoch_ms
+from app.utils.race_cache import RaceCache, get_track_updated_at
+
+# Time indexes by (race_id, track_updated_at); a new track_updated_at means new points
+_index_cache = RaceCache(max_size=32)
+
+
+class TrackTimeIndex:
+    """
+    In-memory time index over one race's track
+    
+    Holds the sorted epoch-millisecond times and positions of the track so
+    nearest-point and interpolated-position lookups are a bisect away
+    rather than a database query.
+    """
+    
+    def __init__(self, race_id, times, latitudes, longitudes, point_ids=None, view=None):
+        self.race_id = race_id
+        self.times = np.asarray(times, dtype=np.int64)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.point_ids = point_ids  # TrackPoint IDs by position (row storage)
+        self.view = view            # Every point column as a TrackView
+        self._time_list = self.times.tolist()  # bisect is fastest on a list
+    
+    def __len__(self):
+        return len(self.times)
+    
+    @classmethod
+    def for_race(cls, race_id, track_updated_at=None):
+        """
+        Get the (cached) index for a race
+        
+        Args:
+            race_id: ID of the race
+            track_updated_at: The race's track_updated_at, looked up when not given
+        
+        Returns:
+            TrackTimeIndex: Index over the race's current points
+        """
+        if track_updated_at is None:
+            track_updated_at = get_track_updated_at(race_id)
+        
+        return _index_cache.get(race_id, track_updated_at, lambda: cls.load(race_id))
+    
+    @classmethod
+    def load(cls, race_id):
+        """
+        Build an index from the race's stored points in one query
+        
+        Row storage is read into the same columnar TrackView the packed
+        storage provides, so point lookups are answered from memory
+        without fetching TrackPoint rows.
+        """
+        if TrackPoint.uses_columnar_storage():
+            view = RaceTrack.get_view(race_id)
+            return cls(race_id, view.timestamp, view.latitude, view.longitude, view=view)
+        
+        rows = db.session.query(
+            TrackPoint.point_id,
+            *[getattr(TrackPoint, name) for name in TrackPoint.API_COLUMNS]
+        ).filter_by(race_id=race_id).order_by(TrackPoint.point_index).all()
+        
+        values = list(zip(*rows)) if rows else [()] * (len(TrackPoint.API_COLUMNS) + 1)
+        columns = {}
+        for name, column_values in zip(TrackPoint.API_COLUMNS, values[1:]):
+            if name == 'timestamp':
+                columns[name] = np.array([datetime_to_epoch_ms(value) for value in column_values], dtype=np.int64)
+            else:
+                # None becomes NaN
+                columns[name] = np.array(column_values, dtype=np.float64)
+        
+        view = TrackView(race_id, columns)
+        return cls(
+            race_id,
+            view.timestamp,
+            view.latitude,
+            view.longitude,
+            point_ids=np.asarray(values[0], dtype=np.int64),
+            view=view
+        )
+    
+    def record(self, position):
+        """
+        Get the point at a position as a TrackPointRecord
+        
+        With row storage the record carries the TrackPoint's point_id, so
+        callers can still reference (or load) the row.
+        """
+        record = self.view[position]
+        if self.point_ids is not None:
+            record = record._replace(point_id=int(self.point_ids[position]))
+        return record
+    
+    def nearest(self, timestamp):
+        """
+        Get the position of the point closest to a time
+        
+        Ties go to the earlier point. Returns None for an empty track.
+        """
+        if not self._time_list:
+            return None
+        
+        target = datetime_to_epoch_ms(timestamp)
+        after = bisect_left(self._time_list, target)
+        if after == len(self._time_list):
+            return after - 1
+        if after == 0 or self._time_list[after] == target:
+            return after
+        
+        before = after - 1
+        before_diff = target - self._time_list[before]
+        after_diff = self._time_list[after] - target
+        return before if before_diff <= after_diff else after
+    
+    def nearest_batch(self, timestamps):
+        """
+        Get the positions of the points closest to many times at once
+        
+        Args:
+            timestamps: Sequence of naive UTC datetimes
+        
+        Returns:
+            ndarray: Position of the nearest point for each timestamp
+        """
+        targets = np.array([datetime_to_epoch_ms(t) for t in timestamps], dtype=np.int64)
+        if not len(self.times):
+            return np.full(len(targets), -1)
+        
+        after = np.searchsorted(self.times, targets, side='left')
+        before = np.clip(after - 1, 0, len(self.times) - 1)
+        after = np.clip(after, 0, len(self.times) - 1)
+        
+        before_diff = np.abs(targets - self.times[before])
+        after_diff = np.abs(self.times[after] - targets)
+        return np.where(before_diff <= after_diff, before, after)
+    
+    def interpolate(self, timestamp):
+        """Get the (lat, lon) position at a time, interpolated between fixes"""
+        if not self._time_list:
+            return None
+        
+        target = datetime_to_epoch_ms(timestamp)
+        after = bisect_left(self._time_list, target)
+        if after == 0:
+            return float(self.latitudes[0]), float(self.longitudes[0])
+        if after == len(self._time_list):
+            return float(self.latitudes[-1]), float(self.longitudes[-1])
+        
+        before = after - 1
+        span = self._time_list[after] - self._time_list[before]
+        fraction = (target - self._time_list[before]) / span if span else 0.0
+        lat = self.latitudes[before] + fraction * (self.latitudes[after] - self.latitudes[before])
+        lon = self.longitudes[before] + fraction * (self.longitudes[after] - self.longitudes[before])
+        return float(lat), float(lon)
+    
+    def interpolate_batch(self, timestamps):
+        """
+        Get interpolated positions for many times at once
+        
+        Returns:
+            tuple: (latitudes, longitudes) arrays
+        """
+        targets = np.array([datetime_to_epoch_ms(t) for t in timestamps], dtype=np.float64)
+        return (
+            np.interp(targets, self.times, self.latitudes),
+            np.interp(targets, self.times, self.longitudes)
+        )
\ No newline at end of file
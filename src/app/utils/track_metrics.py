@@ -0,0 +1,182 @@
+import numpy as np
+from collections import namedtuple
+
+EARTH_RADIUS_M = 6371000  # Radius of earth in meters
+MS_TO_KNOTS = 1.94384     # 1 m/s = 1.94384 knots
+METERS_PER_NM = 1852.0    # Meters in a nautical mile
+
+# Columnar track data: one numpy array per field, epoch seconds for time
+TrackColumns = namedtuple('TrackColumns', ['lat', 'lon', 'ele', 'time'])
+
+
+def points_to_columns(gpx_points):
+    """
+    Convert GPX point records into columnar numpy arrays
+    
+    Points without a timestamp are dropped, matching process_gpx_file.
+    
+    Args:
+        gpx_points: Iterable of GPXPoint records in track order
+    
+    Returns:
+        TrackColumns: float64 lat/lon/ele (NaN when missing) and time arrays
+    """
+    lat = []
+    lon = []
+    ele = []
+    time = []
+    for point in gpx_points:
+        if not point.time:
+            continue
+        lat.append(point.lat)
+        lon.append(point.lon)
+        ele.append(np.nan if point.ele is None else point.ele)
+        time.append(point.time.timestamp())
+    
+    return TrackColumns(
+        np.array(lat, dtype=np.float64),
+        np.array(lon, dtype=np.float64),
+        np.array(ele, dtype=np.float64),
+        np.array(time, dtype=np.float64)
+    )
+
+
+def wrap_longitude(lon):
+    """
+    Wrap longitudes, or differences between them, to [-180, 180)
+    
+    Taken across the antimeridian a longitude difference is the short
+    way round:
+    
+        >>> wrap_longitude(np.array([-179.5, 10.0]) - np.array([179.5, 10.0]))
+        array([1., 0.])
+    """
+    return (np.asarray(lon) + 180.0) % 360.0 - 180.0
+
+
+def haversine_array(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great circle distance between arrays of points
+    
+    Returns:
+        ndarray: Distances in meters
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    
+    dlon = lon2 - lon1
+    dlat = lat2 - lat1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def bearing_array(lat1, lon1, lat2, lon2):
+    """
+    Vectorized initial bearing from the first to the second points
+    
+    Returns:
+        ndarray: Bearings in degrees (0-360)
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    
+    dlon = lon2 - lon1
+    x = np.sin(dlon) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(dlon)
+    return np.degrees(np.arctan2(x, y)) % 360
+
+
+def compute_track_metrics(lat, lon, times):
+    """
+    Compute per-point and total metrics for a whole track in bulk
+    
+    Each point's distance, speed and heading describe the leg arriving at
+    it from the previous point; the first point copies the heading of the
+    first leg and has zero distance and speed. Legs with no positive time
+    difference count as zero speed and are left out of the totals, as in
+    process_gpx_file.
+    
+    Args:
+        lat: Array of latitudes in degrees
+        lon: Array of longitudes in degrees
+        times: Array of timestamps in epoch seconds
+    
+    Returns:
+        dict: Per-point arrays ('distance' in meters, 'speed' in knots,
+              'heading' in degrees, 'cumulative_distance' in meters) and
+              totals ('total_distance' in km, 'max_speed', 'avg_speed',
+              'duration' in seconds)
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    times = np.asarray(times, dtype=np.float64)
+    n = len(lat)
+    
+    distance = np.zeros(n)
+    speed = np.zeros(n)
+    heading = np.zeros(n)
+    
+    if n > 1:
+        # Shared trigonometry for the distance and bearing of every leg
+        phi = np.radians(lat)
+        lam = np.radians(lon)
+        cos_phi = np.cos(phi)
+        sin_phi = np.sin(phi)
+        dphi = np.diff(phi)
+        dlam = np.diff(lam)
+        cos_dlam = np.cos(dlam)
+        
+        a = np.sin(dphi / 2) ** 2 + cos_phi[:-1] * cos_phi[1:] * np.sin(dlam / 2) ** 2
+        leg_distance = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+        
+        x = np.sin(dlam) * cos_phi[1:]
+        y = cos_phi[:-1] * sin_phi[1:] - sin_phi[:-1] * cos_phi[1:] * cos_dlam
+        heading[1:] = np.degrees(np.arctan2(x, y)) % 360
+        heading[0] = heading[1]
+        
+        leg_time = np.diff(times)
+        moving = leg_time > 0
+        
+        np.multiply(leg_distance, moving, out=distance[1:])
+        np.divide(leg_distance, leg_time, out=speed[1:], where=moving)
+        speed[1:] *= MS_TO_KNOTS
+        
+        leg_speeds = speed[1:][moving]
+    else:
+        leg_speeds = speed[:0]
+    
+    cumulative_distance = np.cumsum(distance)
+    
+    return {
+        'distance': distance,
+        'speed': speed,
+        'heading': heading,
+        'cumulative_distance': cumulative_distance,
+        'total_distance': float(cumulative_distance[-1]) / 1000 if n else 0.0,
+        'max_speed': float(leg_speeds.max()) if len(leg_speeds) else 0,
+        'avg_speed': float(leg_speeds.mean()) if len(leg_speeds) else 0,
+        'duration': float(times[-1] - times[0]) if n else 0
+    }
+
+def compute_wind_metrics(speed, heading, wind_direction):
+    """
+    Compute the true wind angle and VMG of every point at once
+    
+    Args:
+        speed: Array of speeds in knots
+        heading: Array of headings in degrees
+        wind_direction: Direction the wind blows from in degrees, either
+                        one value or one per point (None for no wind)
+    
+    Returns:
+        tuple: (true_wind_angle in degrees 0-180, vmg in knots) arrays;
+               NaN where there is no speed, heading or wind
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    heading = np.asarray(heading, dtype=np.float64)
+    if wind_direction is None:
+        missing = np.full(len(heading), np.nan)
+        return missing, missing.copy()
+    
+    wind_direction = np.asarray(wind_direction, dtype=np.float64)
+    true_wind_angle = np.abs((heading - wind_direction + 180) % 360 - 180)
+    vmg = speed * np.cos(np.radians(true_wind_angle))
+    return true_wind_angle, vmg
@@ -0,0 +1,164 @@
+import math
+import numpy as np
+from app.utils.race_cache import RaceCache, get_track_updated_at
+from app.utils.track_index import TrackTimeIndex
+from app.utils.track_metrics import EARTH_RADIUS_M, wrap_longitude
+
+# Meters per pixel at zoom 0 on the equator for 256px web-mercator tiles
+METERS_PER_PIXEL_Z0 = 156543.03392
+
+# Douglas-Peucker importance ranks by (race_id, track_updated_at)
+_importance_cache = RaceCache(max_size=64)
+
+
+def project_local(lat, lon):
+    """
+    Project lat/lon onto a local flat plane in meters
+    
+    An equirectangular projection around the track's mean latitude is
+    accurate enough for the size of a race course. Longitudes are taken
+    relative to the first point the short way round, so a course across
+    the antimeridian does not span the globe.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    if not len(lat):
+        return lat, lon
+    
+    scale = math.cos(math.radians(float(lat.mean())))
+    x = np.radians(wrap_longitude(lon - lon[0])) * EARTH_RADIUS_M * scale
+    y = np.radians(lat - lat[0]) * EARTH_RADIUS_M
+    return x, y
+
+
+def douglas_peucker_importance(x, y):
+    """
+    Rank every vertex by the Douglas-Peucker tolerance at which it is dropped
+    
+    Runs Douglas-Peucker once with no tolerance and records, for each split
+    vertex, its distance from the chord (capped by its parent's so ranks
+    nest). Simplifying at tolerance t then keeps exactly the vertices with
+    importance >= t, so every resolution comes from this one pass.
+    
+    Args:
+        x: Projected x coordinates in meters
+        y: Projected y coordinates in meters
+    
+    Returns:
+        ndarray: Importance per vertex in meters (endpoints are infinite)
+    """
+    n = len(x)
+    importance = np.zeros(n)
+    if n == 0:
+        return importance
+    importance[0] = importance[-1] = np.inf
+    
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        start, end, parent = stack.pop()
+        if end - start < 2:
+            continue
+        
+        # Distance of each inner vertex from the chord start-end
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        length_sq = dx * dx + dy * dy
+        if length_sq > 0:
+            t = np.clip((px * dx + py * dy) / length_sq, 0, 1)
+            distances = np.hypot(px - t * dx, py - t * dy)
+        else:
+            distances = np.hypot(px, py)
+        
+        split = int(np.argmax(distances))
+        rank = min(float(distances[split]), parent)
+        index = start + 1 + split
+        importance[index] = rank
+        
+        stack.append((start, index, rank))
+        stack.append((index, end, rank))
+    
+    return importance
+
+
+def tolerance_for_zoom(zoom, latitude):
+    """Get the simplification tolerance (one screen pixel) in meters for a zoom level"""
+    return METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / (2 ** zoom)
+
+
+def select_vertices(importance, tolerance=0.0, max_points=None):
+    """
+    Pick the vertices to keep for a tolerance and vertex budget
+    
+    Args:
+        importance: Ranks from douglas_peucker_importance
+        tolerance: Minimum importance in meters to keep a vertex
+        max_points: Optional cap on the number of vertices returned
+    
+    Returns:
+        ndarray: Sorted positions of the kept vertices
+    
+    Raises:
+        ValueError: If max_points is below 1
+    """
+    if max_points is not None and max_points < 1:
+        raise ValueError("max_points must be at least 1")
+    
+    keep = np.flatnonzero(importance >= tolerance)
+    if max_points and len(keep) > max_points:
+        # Over budget: keep the most important vertices
+        top = np.argpartition(importance[keep], -max_points)[-max_points:]
+        keep = np.sort(keep[top])
+    return keep
+
+
+def get_race_importance(race_id, track_updated_at=None):
+    """Get the (cached) Douglas-Peucker importance ranks for a race's track"""
+    if track_updated_at is None:
+        track_updated_at = get_track_updated_at(race_id)
+    
+    def build():
+        index = TrackTimeIndex.for_race(race_id, track_updated_at)
+        x, y = project_local(index.latitudes, index.longitudes)
+        return douglas_peucker_importance(x, y)
+    
+    return _importance_cache.get(race_id, track_updated_at, build)
+
+
+def simplify_race_track(race_id, zoom=None, tolerance=None, max_points=None, track_updated_at=None):
+    """
+    Get a race's track simplified for display
+    
+    Args:
+        race_id: ID of the race
+        zoom: Optional map zoom level; sets the tolerance to one pixel
+        tolerance: Optional tolerance in meters (overrides zoom)
+        max_points: Optional cap on the number of vertices returned
+        track_updated_at: The race's track_updated_at, looked up when not given
+    
+    Returns:
+        dict: 'coordinates' ([lat, lon] pairs), 'point_count' (original
+              vertex count) and the 'tolerance' used
+    """
+    if track_updated_at is None:
+        track_updated_at = get_track_updated_at(race_id)
+    
+    index = TrackTimeIndex.for_race(race_id, track_updated_at)
+    if not len(index):
+        return {'coordinates': [], 'point_count': 0, 'tolerance': tolerance or 0.0}
+    
+    if tolerance is None:
+        if zoom is not None:
+            tolerance = tolerance_for_zoom(zoom, float(index.latitudes.mean()))
+        else:
+            tolerance = 0.0
+    
+    importance = get_race_importance(race_id, track_updated_at)
+    keep = select_vertices(importance, tolerance, max_points)
+    
+    return {
+        'coordinates': np.column_stack((index.latitudes[keep], index.longitudes[keep])).tolist(),
+        'point_count': len(index),
+        'tolerance': tolerance
+    }
\ No newline at end of file
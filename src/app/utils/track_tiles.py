@@ -0,0 +1,226 @@
+import json
+import math
+import os
+import shutil
+import numpy as np
+from flask import current_app
+from app.models.track_point import TrackPoint
+from app.utils.race_cache import RaceCache, get_track_updated_at
+from app.utils.track_simplify import get_race_importance, select_vertices, tolerance_for_zoom
+
+# Deepest zoom level tiles are served for
+MAX_TILE_ZOOM = 20
+
+EMPTY_TILE = json.dumps({'type': 'FeatureCollection', 'features': []})
+
+# Per-point columns carried into tiles
+TILE_COLUMNS = ('latitude', 'longitude', 'timestamp', 'speed', 'heading', 'vmg')
+
+# Track columns plus Douglas-Peucker ranks by (race_id, track_updated_at)
+_tile_source_cache = RaceCache(max_size=8)
+
+
+def lonlat_to_tile(lat, lon, zoom):
+    """Get fractional web-mercator tile coordinates for positions at a zoom level"""
+    n = 2 ** zoom
+    lat_rad = np.radians(np.clip(lat, -85.0511, 85.0511))
+    x = (np.asarray(lon) + 180.0) / 360.0 * n
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def get_tile_cache_dir(race_id, track_updated_at=None):
+    """Get the on-disk tile directory for a race (or one version of it)"""
+    race_dir = os.path.join(current_app.config['TILE_CACHE_DIR'], str(race_id))
+    if track_updated_at is None:
+        return race_dir
+    return os.path.join(race_dir, track_updated_at.strftime('%Y%m%d%H%M%S%f'))
+
+
+def clear_race_tiles(race_id):
+    """Delete every cached tile for a race"""
+    shutil.rmtree(get_tile_cache_dir(race_id), ignore_errors=True)
+
+
+def get_tile_source(race_id, track_updated_at):
+    """Get a race's tile columns and importance ranks, loading them once"""
+    def build():
+        source = TrackPoint.get_point_page(race_id, TILE_COLUMNS)
+        # The same ranks simplify_race_track uses, so the pass runs once per race
+        source['importance'] = get_race_importance(race_id, track_updated_at)
+        return source
+    
+    return _tile_source_cache.get(race_id, track_updated_at, build)
+
+
+def build_tile(race_id, source, zoom, x, y):
+    """
+    Cut one tile out of a race's track, simplified for its zoom level
+    
+    The tile holds the track segments crossing it (as one LineString or
+    MultiLineString) and the kept vertices inside it as Point features
+    with the TrackPoint.to_geojson properties.
+    
+    Args:
+        race_id: ID of the race
+        source: Columns from get_tile_source
+        zoom: Zoom level
+        x: Tile column
+        y: Tile row
+    
+    Returns:
+        dict: GeoJSON FeatureCollection, or None if the track misses the tile
+    """
+    latitudes = source['latitude']
+    if not len(latitudes):
+        return None
+    
+    tolerance = tolerance_for_zoom(zoom, float(np.mean(latitudes)))
+    keep = select_vertices(source['importance'], tolerance)
+    
+    lat = latitudes[keep]
+    lon = source['longitude'][keep]
+    fraction_x, fraction_y = lonlat_to_tile(lat, lon, zoom)
+    tile_x = np.floor(fraction_x).astype(np.int64)
+    tile_y = np.floor(fraction_y).astype(np.int64)
+    
+    # Vertices in the tile
+    inside = (tile_x == x) & (tile_y == y)
+    positions = np.flatnonzero(inside).tolist()
+    
+    # Segments in the tile; most stay within one tile, and those that
+    # don't are walked in half-tile steps if their bounds reach it. A
+    # segment across the antimeridian is walked the short way round
+    tile_count = 2 ** zoom
+    dx = np.diff(fraction_x)
+    wraps = np.abs(dx) > tile_count / 2
+    dx = np.where(wraps, (dx + tile_count / 2) % tile_count - tile_count / 2, dx)
+    dy = np.diff(fraction_y)
+    crosses = (np.diff(tile_x) != 0) | (np.diff(tile_y) != 0)
+    starts = set(np.flatnonzero(~crosses & inside[:-1]).tolist())
+    reaches = wraps | (
+        (np.minimum(tile_x[:-1], tile_x[1:]) <= x) & (np.maximum(tile_x[:-1], tile_x[1:]) >= x) &
+        (np.minimum(tile_y[:-1], tile_y[1:]) <= y) & (np.maximum(tile_y[:-1], tile_y[1:]) >= y)
+    )
+    for start in np.flatnonzero(crosses & reaches).tolist():
+        steps = np.linspace(0.0, 1.0, int(math.ceil(2 * max(abs(dx[start]), abs(dy[start])))) + 1)
+        walked_x = np.floor(fraction_x[start] + steps * dx[start]).astype(np.int64) % tile_count
+        walked_y = np.floor(fraction_y[start] + steps * dy[start]).astype(np.int64)
+        if ((walked_x == x) & (walked_y == y)).any():
+            starts.add(start)
+    
+    if not positions and not starts:
+        return None
+    
+    coordinates = np.column_stack((lon, lat)).tolist()
+    features = []
+    
+    # Consecutive segments join into one line
+    lines = []
+    for start in sorted(starts):
+        if lines and lines[-1][-1] == start:
+            lines[-1].append(start + 1)
+        else:
+            lines.append([start, start + 1])
+    if lines:
+        line_coordinates = [[coordinates[i] for i in line] for line in lines]
+        features.append({
+            'type': 'Feature',
+            'geometry': {
+                'type': 'LineString',
+                'coordinates': line_coordinates[0]
+            } if len(lines) == 1 else {
+                'type': 'MultiLineString',
+                'coordinates': line_coordinates
+            },
+            'properties': {'race_id': race_id}
+        })
+    
+    # Property values for the vertices in the tile, converted once
+    point_indexes = keep[positions]
+    timestamps = np.datetime_as_string(source['timestamp'][point_indexes].astype('datetime64[ms]'), unit='s')
+    for position, point_index, timestamp, speed, heading, vmg in zip(
+        positions,
+        point_indexes.tolist(),
+        timestamps.tolist(),
+        *[[None if value != value else value for value in source[name][point_indexes].tolist()]
+          for name in ('speed', 'heading', 'vmg')]
+    ):
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': coordinates[position]},
+            'properties': {
+                'point_index': point_index,
+                'timestamp': timestamp,
+                'speed': speed,
+                'heading': heading,
+                'vmg': vmg
+            }
+        })
+    
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _write_file(path, content):
+    """Write a file atomically so concurrent readers never see it half written"""
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+
+def get_race_tile(race_id, zoom, x, y, track_updated_at=None):
+    """
+    Get one GeoJSON tile of a race's track, from the on-disk cache
+    
+    The first request for a tile cuts just that tile from the race's
+    cached columns and writes it; later requests are a file read. Tiles
+    live under a directory per track version (track_updated_at), so
+    reprocessing a race never serves stale tiles.
+    
+    Args:
+        race_id: ID of the race
+        zoom: Zoom level
+        x: Tile column
+        y: Tile row
+        track_updated_at: The race's track_updated_at, looked up when not given
+    
+    Returns:
+        str: GeoJSON FeatureCollection
+    """
+    if track_updated_at is None:
+        track_updated_at = get_track_updated_at(race_id)
+    
+    version_dir = get_tile_cache_dir(race_id, track_updated_at)
+    tile_dir = os.path.join(version_dir, str(zoom), str(x))
+    tile_path = os.path.join(tile_dir, f'{y}.json')
+    
+    if os.path.exists(tile_path):
+        with open(tile_path) as f:
+            return f.read()
+    
+    if not os.path.isdir(version_dir):
+        _remove_older_versions(race_id, version_dir)
+    
+    collection = build_tile(race_id, get_tile_source(race_id, track_updated_at), zoom, x, y)
+    tile = EMPTY_TILE if collection is None else json.dumps(collection)
+    os.makedirs(tile_dir, exist_ok=True)
+    _write_file(tile_path, tile)
+    return tile
+
+
+def _remove_older_versions(race_id, version_dir):
+    """
+    Drop tiles left behind by earlier versions of a race
+    
+    Version directory names are fixed-width timestamps, so they sort in
+    time order. Newer versions are kept: a request still holding an old
+    track_updated_at must not delete tiles for the current one.
+    """
+    race_dir = get_tile_cache_dir(race_id)
+    if not os.path.isdir(race_dir):
+        return
+    version = os.path.basename(version_dir)
+    for name in os.listdir(race_dir):
+        if name < version:
+            shutil.rmtree(os.path.join(race_dir, name), ignore_errors=True)
@@ -0,0 +1,211 @@
+import numpy as np
+from app import db
+from app.models.track_point import TrackPoint
+from app.models.maneuver import Maneuver, ManeuverType
+from app.models.race_segment import RaceSegment, SegmentType
+from app.models.race_track import datetime_to_epoch_ms, epoch_ms_to_datetime
+from app.utils.race_cache import RaceCache, get_track_updated_at
+from app.utils.track_metrics import haversine_array, METERS_PER_NM
+
+# Prefix sums by (race_id, track_updated_at); each holds a handful of arrays per point
+_prefix_cache = RaceCache(max_size=16)
+
+# Maneuver metrics carried in prefix sums
+MANEUVER_METRICS = ('duration', 'speed_loss', 'efficiency')
+
+
+def _prefix(values):
+    """Prefix sums with a leading zero, so sum(values[i:j]) is p[j] - p[i]"""
+    return np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+
+
+class TrackPrefixSums:
+    """
+    Cumulative arrays over one race's track for O(1) time-window stats
+    
+    Built once per race version from the stored points, segments and
+    maneuvers. Stats for any window then come from differences of prefix
+    sums at the window's ends (found by binary search), however long the
+    track, so crop selections can be re-evaluated as fast as a slider moves.
+    """
+    
+    def __init__(self, times, latitudes, longitudes, speeds, vmg, segments, maneuvers):
+        """
+        Args:
+            times: Point times in epoch milliseconds, sorted
+            latitudes, longitudes: Point positions
+            speeds, vmg: Per-point speed and VMG in knots (NaN if missing)
+            segments: (segment_type, start_index, end_index) tuples
+            maneuvers: (maneuver_type, timestamp, duration, speed_loss,
+                       efficiency) tuples in time order
+        """
+        n = len(times)
+        self.times = np.asarray(times, dtype=np.int64)
+        
+        # Leg k runs from point k - 1 to point k; leg 0 is empty
+        legs = np.zeros(n)
+        if n > 1:
+            legs[1:] = haversine_array(latitudes[:-1], longitudes[:-1], latitudes[1:], longitudes[1:])
+        leg_seconds = np.zeros(n)
+        leg_seconds[1:] = np.diff(self.times) / 1000.0
+        self.distance = np.cumsum(legs)
+        
+        speeds = np.asarray(speeds, dtype=np.float64)
+        self.speed_sum = _prefix(np.nan_to_num(speeds))
+        self.speed_count = _prefix(~np.isnan(speeds))
+        
+        # Sparse table of maxima over power-of-two spans for O(1) range max
+        self.speed_max = [np.where(np.isnan(speeds), -np.inf, speeds).astype(np.float32)]
+        span = 1
+        while span * 2 <= n:
+            previous = self.speed_max[-1]
+            self.speed_max.append(np.maximum(previous[:-span], previous[span:]))
+            span *= 2
+        
+        # Per segment type: distance and time of the legs ending in it, and
+        # the VMG of its points
+        point_types = np.full(n, -1)
+        type_codes = {segment_type: code for code, segment_type in enumerate(SegmentType)}
+        for segment_type, start_index, end_index in segments:
+            point_types[start_index:end_index + 1] = type_codes[segment_type]
+        vmg = np.asarray(vmg, dtype=np.float64)
+        self.segments = {}
+        for segment_type, code in type_codes.items():
+            in_type = point_types == code
+            if not in_type.any():
+                continue
+            type_vmg = np.where(in_type, vmg, np.nan)
+            self.segments[segment_type.value] = {
+                'distance': _prefix(np.where(in_type, legs, 0.0)),
+                'seconds': _prefix(np.where(in_type, leg_seconds, 0.0)),
+                'vmg_sum': _prefix(np.nan_to_num(type_vmg)),
+                'vmg_count': _prefix(~np.isnan(type_vmg))
+            }
+        
+        # Per maneuver type: sorted times and prefix sums of each metric
+        self.maneuvers = {}
+        for maneuver_type in ManeuverType:
+            rows = [row for row in maneuvers if row[0] is maneuver_type]
+            if not rows:
+                continue
+            by_type = {'times': np.array([datetime_to_epoch_ms(row[1]) for row in rows], dtype=np.int64)}
+            for position, name in enumerate(MANEUVER_METRICS, start=2):
+                values = np.array([np.nan if row[position] is None else row[position] for row in rows])
+                by_type[f'{name}_sum'] = _prefix(np.nan_to_num(values))
+                by_type[f'{name}_count'] = _prefix(~np.isnan(values))
+            self.maneuvers[maneuver_type.value] = by_type
+    
+    def __len__(self):
+        return len(self.times)
+    
+    @classmethod
+    def for_race(cls, race_id, track_updated_at=None):
+        """Get the (cached) prefix sums for a race"""
+        if track_updated_at is None:
+            track_updated_at = get_track_updated_at(race_id)
+        
+        return _prefix_cache.get(race_id, track_updated_at, lambda: cls.load(race_id))
+    
+    @classmethod
+    def load(cls, race_id):
+        """Build prefix sums from a race's stored track, segments and maneuvers"""
+        page = TrackPoint.get_point_page(race_id, ('timestamp', 'latitude', 'longitude', 'speed', 'vmg'))
+        segments = db.session.query(
+            RaceSegment.segment_type, RaceSegment.start_index, RaceSegment.end_index
+        ).filter_by(race_id=race_id).all()
+        maneuvers = db.session.query(
+            Maneuver.maneuver_type, Maneuver.timestamp,
+            *[getattr(Maneuver, name) for name in MANEUVER_METRICS]
+        ).filter_by(race_id=race_id).order_by(Maneuver.timestamp).all()
+        
+        return cls(
+            page['timestamp'], page['latitude'], page['longitude'],
+            page['speed'], page['vmg'],
+            [row for row in segments if row.start_index is not None and row.end_index is not None],
+            maneuvers
+        )
+    
+    def _max_speed(self, first, last):
+        """Get the maximum speed over points first..last (inclusive)"""
+        level = (last - first + 1).bit_length() - 1
+        table = self.speed_max[level]
+        value = float(max(table[first], table[last - (1 << level) + 1]))
+        return None if value == -np.inf else value
+    
+    def window(self, start_time=None, end_time=None):
+        """
+        Get stats for the points between two times
+        
+        Args:
+            start_time: Naive UTC start of the window; None for the track start
+            end_time: Naive UTC end of the window; None for the track end
+        
+        Returns:
+            dict: Point count, time range, duration (seconds), distance
+                  (nautical miles), avg and max speed, and segment and
+                  maneuver stats by type, all for the window
+        """
+        start_ms = None if start_time is None else datetime_to_epoch_ms(start_time)
+        end_ms = None if end_time is None else datetime_to_epoch_ms(end_time)
+        first = 0 if start_ms is None else int(np.searchsorted(self.times, start_ms, side='left'))
+        last = len(self.times) - 1 if end_ms is None else int(np.searchsorted(self.times, end_ms, side='right')) - 1
+        
+        if last < first:
+            return {
+                'point_count': 0, 'start_time': None, 'end_time': None, 'duration': 0,
+                'distance': 0.0, 'avg_speed': None, 'max_speed': None,
+                'segments': {}, 'maneuvers': {}
+            }
+        
+        speed_count = self.speed_count[last + 1] - self.speed_count[first]
+        stats = {
+            'point_count': last - first + 1,
+            'start_time': epoch_ms_to_datetime(int(self.times[first])).isoformat(),
+            'end_time': epoch_ms_to_datetime(int(self.times[last])).isoformat(),
+            'duration': (int(self.times[last]) - int(self.times[first])) / 1000.0,
+            'distance': float(self.distance[last] - self.distance[first]) / METERS_PER_NM,
+            'avg_speed': float((self.speed_sum[last + 1] - self.speed_sum[first]) / speed_count) if speed_count else None,
+            'max_speed': self._max_speed(first, last),
+            'segments': {},
+            'maneuvers': {}
+        }
+        
+        # Legs first + 1..last lie inside the window
+        for type_value, sums in self.segments.items():
+            seconds = sums['seconds'][last + 1] - sums['seconds'][first + 1]
+            if seconds <= 0:
+                continue
+            vmg_count = sums['vmg_count'][last + 1] - sums['vmg_count'][first]
+            stats['segments'][type_value] = {
+                'distance': float(sums['distance'][last + 1] - sums['distance'][first + 1]) / METERS_PER_NM,
+                'duration': float(seconds),
+                'avg_vmg': float((sums['vmg_sum'][last + 1] - sums['vmg_sum'][first]) / vmg_count) if vmg_count else None
+            }
+        
+        window_start = self.times[first]
+        window_end = self.times[last]
+        for type_value, sums in self.maneuvers.items():
+            lower = int(np.searchsorted(sums['times'], window_start, side='left'))
+            upper = int(np.searchsorted(sums['times'], window_end, side='right'))
+            if upper <= lower:
+                continue
+            maneuver_stats = {'count': upper - lower}
+            for name in MANEUVER_METRICS:
+                count = sums[f'{name}_count'][upper] - sums[f'{name}_count'][lower]
+                total = sums[f'{name}_sum'][upper] - sums[f'{name}_sum'][lower]
+                maneuver_stats[f'avg_{name}'] = float(total / count) if count else None
+            stats['maneuvers'][type_value] = maneuver_stats
+        
+        return stats
+
+
+def get_window_stats(race, start_time=None, end_time=None):
+    """
+    Get stats for a time window of a race's track
+    
+    With no times given, the race's crop window is used (the whole track
+    if it has none).
+    """
+    if start_time is None and end_time is None:
+        start_time, end_time = race.crop_start, race.crop_end
+    return TrackPrefixSums.for_race(race.race_id, race.track_updated_at).window(start_time, end_time)
@@ -0,0 +1,238 @@
+import numpy as np
+from app import db
+from app.models.track_point import TrackPoint
+from app.models.race_track import RaceTrack, datetime_to_epoch_ms
+from app.models.wind_sample import WindSample
+from app.utils.track_metrics import compute_wind_metrics
+
+
+def interpolate_direction(sample_times, directions, times):
+    """
+    Interpolate wind directions onto times, the short way round the circle
+    
+    The directions are unwrapped so a shift from 350° to 10° passes through
+    0° rather than back through 180°. Times outside the timeline take the
+    nearest sample's direction.
+    
+    Args:
+        sample_times: Sorted sample times (epoch milliseconds)
+        directions: Sample directions in degrees
+        times: Times to interpolate at (epoch milliseconds)
+    
+    Returns:
+        ndarray: Directions in degrees (0-360)
+    """
+    unwrapped = np.degrees(np.unwrap(np.radians(directions)))
+    return np.interp(times, sample_times, unwrapped) % 360
+
+
+def interpolate_speed(sample_times, speeds, times):
+    """Interpolate wind speeds onto times, skipping samples with no speed"""
+    known = ~np.isnan(speeds)
+    if not known.any():
+        return np.full(len(times), np.nan)
+    return np.interp(times, sample_times[known], speeds[known])
+
+
+def wind_at_times(timeline, times, default_direction=None):
+    """
+    Get the wind direction and speed at each of many times
+    
+    Args:
+        timeline: (times, directions, speeds) from WindSample.get_timeline
+        times: Times to evaluate (epoch milliseconds)
+        default_direction: Race.wind_direction, used when there are no samples
+    
+    Returns:
+        tuple: (directions, speeds) arrays, or (None, None) when the race
+               has no wind information at all
+    """
+    sample_times, directions, speeds = timeline
+    times = np.asarray(times, dtype=np.float64)
+    
+    if len(sample_times):
+        return (
+            interpolate_direction(sample_times, directions, times),
+            interpolate_speed(sample_times, speeds, times)
+        )
+    if default_direction is not None:
+        return np.full(len(times), float(default_direction)), np.full(len(times), np.nan)
+    return None, None
+
+
+def sample_window(sample_times, time):
+    """
+    Get the span of track a sample's value influences
+    
+    Interpolation only reaches from a sample to its neighbours; the first
+    and last samples also set the wind before and after the timeline.
+    
+    Args:
+        sample_times: Sorted sample times (epoch milliseconds) including
+                      the sample itself
+        time: The sample's time (epoch milliseconds)
+    
+    Returns:
+        tuple: (start, end) in epoch milliseconds; None for unbounded
+    """
+    position = int(np.searchsorted(sample_times, time, side='left'))
+    end_position = int(np.searchsorted(sample_times, time, side='right'))
+    start = int(sample_times[position - 1]) if position > 0 else None
+    end = int(sample_times[end_position]) if end_position < len(sample_times) else None
+    return start, end
+
+
+def merge_windows(*windows):
+    """Get the smallest window covering several (start, end) windows"""
+    starts = [start for start, _ in windows]
+    ends = [end for _, end in windows]
+    return (
+        None if None in starts else min(starts),
+        None if None in ends else max(ends)
+    )
+
+
+def recompute_wind_metrics(race, window=(None, None)):
+    """
+    Recompute VMG and true wind angle from the race's wind timeline
+    
+    Only points inside the window are loaded and written, so editing one
+    sample touches just the stretch of track between its neighbours. The
+    caller commits.
+    
+    Args:
+        race: Race to update
+        window: (start, end) in epoch milliseconds; None for unbounded
+    
+    Returns:
+        int: Number of points updated
+    """
+    start, end = window
+    timeline = WindSample.get_timeline(race.race_id)
+    
+    if TrackPoint.uses_columnar_storage():
+        track = db.session.get(RaceTrack, race.race_id)
+        if track is None or not track.point_count:
+            return 0
+        
+        # Copy out of the stored blob, which is read-only
+        columns = {
+            name: np.array(column)
+            for name, column in RaceTrack.unpack(track.point_count, track.data).items()
+        }
+        times = columns['timestamp']
+        first = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        last = len(times) if end is None else int(np.searchsorted(times, end, side='right'))
+        if first >= last:
+            return 0
+        
+        directions, _ = wind_at_times(timeline, times[first:last], race.wind_direction)
+        columns['true_wind_angle'][first:last], columns['vmg'][first:last] = compute_wind_metrics(
+            columns['speed'][first:last], columns['heading'][first:last], directions
+        )
+        RaceTrack.store(race.race_id, columns)
+        return last - first
+    
+    from app.models.race_track import epoch_ms_to_datetime
+    
+    query = db.session.query(
+        TrackPoint.point_id,
+        TrackPoint.timestamp,
+        TrackPoint.speed,
+        TrackPoint.heading
+    ).filter(TrackPoint.race_id == race.race_id)
+    if start is not None:
+        query = query.filter(TrackPoint.timestamp >= epoch_ms_to_datetime(start))
+    if end is not None:
+        query = query.filter(TrackPoint.timestamp <= epoch_ms_to_datetime(end))
+    
+    rows = query.all()
+    if not rows:
+        return 0
+    point_ids, timestamps, speeds, headings = zip(*rows)
+    
+    times = np.array([datetime_to_epoch_ms(timestamp) for timestamp in timestamps], dtype=np.int64)
+    directions, _ = wind_at_times(timeline, times, race.wind_direction)
+    true_wind_angle, vmg = compute_wind_metrics(
+        np.array(speeds, dtype=np.float64),
+        np.array(headings, dtype=np.float64),
+        directions
+    )
+    return TrackPoint.bulk_update(point_ids, {
+        'vmg': vmg,
+        'true_wind_angle': true_wind_angle
+    })
+
+
+def _finish_wind_edit(race, window):
+    """Recompute the affected window and commit a wind timeline edit"""
+    from app.utils.race_analysis import analyze_race
+    
+    point_count = recompute_wind_metrics(race, window)
+    
+    # Maneuvers and segments are classified against the wind; only those
+    # near the window can change. The cached track carries VMG and TWA,
+    # which did change, so it still has to go
+    analyze_race(race, window)
+    race.invalidate_track_caches()
+    db.session.commit()
+    return point_count
+
+
+def add_wind_sample(race, timestamp, direction, speed=None):
+    """
+    Add a sample to a race's wind timeline and update the affected points
+    
+    Returns:
+        tuple: (WindSample, number of points updated)
+    """
+    sample = WindSample(race_id=race.race_id, timestamp=timestamp, direction=direction % 360, speed=speed)
+    db.session.add(sample)
+    db.session.flush()
+    
+    sample_times = WindSample.get_timeline(race.race_id)[0]
+    window = sample_window(sample_times, datetime_to_epoch_ms(timestamp))
+    return sample, _finish_wind_edit(race, window)
+
+
+def update_wind_sample(race, sample, timestamp=None, direction=None, speed=None):
+    """
+    Change a wind sample and update the points it affected before or after
+    
+    Returns:
+        int: Number of points updated
+    """
+    old_window = sample_window(
+        WindSample.get_timeline(race.race_id)[0],
+        datetime_to_epoch_ms(sample.timestamp)
+    )
+    
+    if timestamp is not None:
+        sample.timestamp = timestamp
+    if direction is not None:
+        sample.direction = direction % 360
+    if speed is not None:
+        sample.speed = speed
+    db.session.flush()
+    
+    new_window = sample_window(
+        WindSample.get_timeline(race.race_id)[0],
+        datetime_to_epoch_ms(sample.timestamp)
+    )
+    return _finish_wind_edit(race, merge_windows(old_window, new_window))
+
+
+def delete_wind_sample(race, sample):
+    """
+    Remove a wind sample and update the points it affected
+    
+    Returns:
+        int: Number of points updated
+    """
+    window = sample_window(
+        WindSample.get_timeline(race.race_id)[0],
+        datetime_to_epoch_ms(sample.timestamp)
+    )
+    db.session.delete(sample)
+    db.session.flush()
+    return _finish_wind_edit(race, window)
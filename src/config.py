@@ -13,6 +13,34 @@ class Config:
     
     # App-specific settings
     MAX_GPX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
+    MAX_BATCH_UPLOAD_SIZE = 500 * 1024 * 1024  # Total GPX bytes per batch, after unzipping
+    MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # Largest request body Flask accepts
+    
+    # Background race processing
+    RACE_PROCESSING_ASYNC = True
+    RACE_PROCESSING_WORKERS = int(os.environ.get('RACE_PROCESSING_WORKERS') or 0) or None  # Defaults to CPU count
+    
+    # Track storage backend: 'rows' (one TrackPoint per fix) or 'columnar' (packed RaceTrack blob)
+    TRACK_STORAGE = os.environ.get('TRACK_STORAGE') or 'rows'
+    
+    # GPS cleanup before speed, heading and VMG are derived (see track_filter)
+    TRACK_FILTER_ENABLED = True
+    TRACK_OUTLIER_WINDOW = 9             # Fixes in the rolling median window
+    TRACK_OUTLIER_THRESHOLD = 4.0        # Robust deviations that mark an outlier
+    TRACK_OUTLIER_MIN_DEVIATION = 20.0   # Meters
+    TRACK_RESAMPLE_INTERVAL = None       # Seconds; None keeps the logged fix times
+    TRACK_RESAMPLE_MAX_GAP = 10.0        # Seconds; longer gaps are not filled in
+    TRACK_SMOOTHING_WINDOW = 9           # Savitzky-Golay window in fixes; 0 disables
+    TRACK_SMOOTHING_ORDER = 2
+    
+    # Maximum number of vertices sent to the map for one track
+    TRACK_VERTEX_BUDGET = 5000
+    
+    # Longest shared time grid for fleet comparisons; the step widens to fit
+    FLEET_MAX_GRID_POINTS = 20000
+    
+    # On-disk cache of per-race map tiles
+    TILE_CACHE_DIR = os.environ.get('TILE_CACHE_DIR') or os.path.join(basedir, 'tile_cache')
     
     @staticmethod
     def init_app(app):
@@ -32,6 +60,7 @@ class TestingConfig(Config):
     SQLALCHEMY_DATABASE_URI = os.environ.get('TEST_DATABASE_URL') or \
         'sqlite:///' + os.path.join(basedir, 'test-sailing-data.sqlite')
     WTF_CSRF_ENABLED = False
+    RACE_PROCESSING_ASYNC = False  # Process races inline so tests are deterministic
 
 
 class ProductionConfig(Config):
@@ -1,6 +1,8 @@
 import os
-from app import create_app, db
-from app.models import User  # Import your models here
+from contextlib import ExitStack
+import click
+from app import create_app, db, race_queue
+from app.models import User, Race  # Import your models here
 
 # Create app instance based on environment variable or default to development
 app = create_app(os.getenv('FLASK_CONFIG') or 'default')
@@ -11,8 +13,71 @@ def make_shell_context():
     return {
         'db': db,
         'User': User,
+        'Race': Race,
         # Add more models as they are created
     }
 
+@app.cli.command('process-races')
+@click.option('--all', 'reprocess_all', is_flag=True, help='Reprocess races that were already processed.')
+def process_races(reprocess_all):
+    """Work through the backlog of unprocessed races using the worker pool"""
+    query = Race.query
+    if not reprocess_all:
+        query = query.filter(db.or_(Race.is_processed.is_(False), Race.is_processed.is_(None)))
+    race_ids = [race_id for (race_id,) in query.with_entities(Race.race_id).all()]
+    
+    jobs = {race_id: race_queue.submit(race_id) for race_id in race_ids}
+    failed = 0
+    for race_id, job in jobs.items():
+        try:
+            processed = job.result()
+        except Exception:
+            processed = False
+        failed += not processed
+        click.echo(f"Race {race_id}: {'processed' if processed else 'failed'}")
+    
+    race_queue.shutdown()
+    click.echo(f'{len(race_ids) - failed} race(s) processed, {failed} failed')
+
+@app.cli.command('upload-races')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=True))
+@click.option('--user', 'user_ref', required=True, help='ID or email of the user who owns the races.')
+@click.option('--date', 'race_date', type=click.DateTime(formats=['%Y-%m-%d']), help='Race date for every file (default: date of the first track point).')
+def upload_races(paths, user_ref, race_date):
+    """Ingest many GPX files, zips of them or folders of either, one race per GPX file"""
+    from app.utils.batch_upload import ingest_batch
+    
+    if user_ref.isdigit():
+        user = db.session.get(User, int(user_ref))
+    else:
+        user = User.query.filter_by(email=user_ref).first()
+    if user is None:
+        raise click.ClickException(f'No user {user_ref}')
+    
+    # Folders contribute the GPX and zip files directly inside them
+    file_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            file_paths.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith(('.gpx', '.zip'))
+            )
+        else:
+            file_paths.append(path)
+    
+    with ExitStack() as stack:
+        files = [(path, stack.enter_context(open(path, 'rb'))) for path in file_paths]
+        report = ingest_batch(files, user.id, race_date, wait=True)
+    
+    for entry in report:
+        detail = f" (race {entry['race_id']})" if 'race_id' in entry else ''
+        error = f": {entry['error']}" if entry.get('error') else ''
+        click.echo(f"{entry['filename']}: {entry['status']}{detail}{error}")
+    
+    race_queue.shutdown()
+    accepted = sum(1 for entry in report if entry['status'] not in ('rejected', 'duplicate'))
+    duplicates = sum(1 for entry in report if entry['status'] == 'duplicate')
+    click.echo(f'{accepted} of {len(report)} file(s) ingested, {duplicates} already uploaded')
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file